@@ -22,8 +22,10 @@
 # $Date: 2013/03/01 05:07:45 $
 # $Author: tnakazat $
 #
+import ast
 import bisect
 import collections
+import functools
 import os
 import re
 import time
@@ -39,93 +41,87 @@ from pipeline.infrastructure.utils import absolute_path
 LOG = infrastructure.get_logger(__name__)
 
 
-def __coldesc(vtype, option, maxlen, ndim, comment, unit=None):
-    d = {'dataManagerGroup': 'StandardStMan',
-         'dataManagerType': 'StandardStMan',
-         'valueType': vtype,
-         'option': option,
-         'maxlen': maxlen,
-         'comment': comment}
-    if ndim > 0:
-        d['ndim'] = ndim
-    if unit is not None:
-        d['keywords'] = {'UNIT': unit}
-    return d
+# Default data manager for data table columns.
+# dataManagerGroup and dataManagerType is always 'StandardStMan'.
+_COLDESC_DEFAULTS = {'dataManagerGroup': 'StandardStMan',
+                     'dataManagerType': 'StandardStMan'}
 
 
-# Description for data table columns as dictionary.
-# Each value is a tuple containing:
-#
-#    (valueType,option,maxlen,ndim,comment[,unit])
+def _tabledesc(coldefs):
+    return {name: {**_COLDESC_DEFAULTS,
+                   'valueType': vtype,
+                   'option': option,
+                   'maxlen': maxlen,
+                   'comment': comment,
+                   **({'ndim': ndim} if ndim > 0 else {}),
+                   **({'keywords': {'UNIT': unit}} if unit is not None else {})}
+            for name, vtype, option, maxlen, ndim, comment, unit in coldefs}
+
+
+# Description for data table columns.
+# Each column is defined by a tuple containing:
 #
-# dataManagerGroup and dataManagerType is always 'StandardStMan'.
+#    (name,valueType,option,maxlen,ndim,comment,unit)
 #
 # 2018/07/31 HE : added SHIFT_RA, SHIFT_DEC for CAS-11674
 # 2019/05/23 HE : added OFS_RA, OFS_DEC for PIPE-220
-def __tabledescro():
-    TD_DESC_RO = [
-        #    __coldesc('integer', 0, 0, -1, 'Primary key'),
-        __coldesc('integer', 0, 0, -1, 'Row number'),
-        __coldesc('integer', 0, 0, -1, 'Scan number'),
-        __coldesc('integer', 0, 0, -1, 'IF number'),
-        __coldesc('integer', 0, 0, -1, 'Number of Polarizations'),
-        __coldesc('integer', 0, 0, -1, 'Beam number'),
-        __coldesc('string', 0, 0, -1, 'Date'),
-        __coldesc('double', 0, 0, -1, 'Time in MJD', 'd'),
-        __coldesc('double', 0, 0, -1, 'Elapsed time since first scan' 'd'),
-        __coldesc('double', 0, 0, -1, 'Exposure time', 's'),
-        __coldesc('double', 0, 0, -1, 'Right Ascension', 'deg'),
-        __coldesc('double', 0, 0, -1, 'Declination', 'deg'),
-        __coldesc('double', 0, 0, -1, 'Shifted Right Ascension', 'deg'),
-        __coldesc('double', 0, 0, -1, 'Shifted Declination', 'deg'),
-        __coldesc('double', 0, 0, -1, 'Offset Right Ascension', 'deg'),
-        __coldesc('double', 0, 0, -1, 'Offset Declination', 'deg'),
-        __coldesc('double', 0, 0, -1, 'Azimuth', 'deg'),
-        __coldesc('double', 0, 0, -1, 'Elevation', 'deg'),
-        __coldesc('integer', 0, 0, -1, 'Number of channels'),
-        __coldesc('double', 0, 0, 1, 'Tsys', 'K'),
-        __coldesc('string', 0, 0, -1, 'Target name'),
-        __coldesc('integer', 0, 0, -1, 'Antenna index'),
-        __coldesc('integer', 0, 0, -1, 'Source type enum'),
-        __coldesc('integer', 0, 0, -1, 'Field ID')
-    ]
-
-    name = [
-        'ROW', 'SCAN', 'IF', 'NPOL', 'BEAM', 'DATE',
-        'TIME', 'ELAPSED', 'EXPOSURE', 'RA', 'DEC',
-        'SHIFT_RA', 'SHIFT_DEC', 'OFS_RA', 'OFS_DEC',
-        'AZ', 'EL', 'NCHAN', 'TSYS', 'TARGET', 'ANTENNA',
-        'SRCTYPE', 'FIELD_ID'
-    ]
-    return dict(zip(name, TD_DESC_RO))
-
-
-def __tabledescrw():
-    TD_DESC_RW = [
-        __coldesc('double', 0, 0, 2, 'Statistics'),
-        __coldesc('integer', 0, 0, 2, 'Flgas'),
-        __coldesc('integer', 0, 0, 2, 'Permanent flags'),
-        __coldesc('integer', 0, 0, 1, 'Actual flag'),
-        __coldesc('integer', 0, 0, -1, 'Number of mask regions'),
-        __coldesc('integer', 0, 0, 2, 'List of mask ranges'),
-        __coldesc('integer', 0, 0, -1, 'Unchanged row or not'),
-        __coldesc('integer', 0, 0, -1, 'Position group id')
-    ]
-
-    name = [
-        'STATISTICS', 'FLAG', 'FLAG_PERMANENT',
-        'FLAG_SUMMARY', 'NMASK', 'MASKLIST', 'NOCHANGE',
-        'POSGRP']
-    return dict(zip(name, TD_DESC_RW))
-
-
-TABLEDESC_RO = __tabledescro()
-TABLEDESC_RW = __tabledescrw()
+TABLEDESC_RO = _tabledesc([
+    ('ROW', 'integer', 0, 0, -1, 'Row number', None),
+    ('SCAN', 'integer', 0, 0, -1, 'Scan number', None),
+    ('IF', 'integer', 0, 0, -1, 'IF number', None),
+    ('NPOL', 'integer', 0, 0, -1, 'Number of Polarizations', None),
+    ('BEAM', 'integer', 0, 0, -1, 'Beam number', None),
+    ('DATE', 'string', 0, 0, -1, 'Date', None),
+    ('TIME', 'double', 0, 0, -1, 'Time in MJD', 'd'),
+    ('ELAPSED', 'double', 0, 0, -1, 'Elapsed time since first scan', 'd'),
+    ('EXPOSURE', 'double', 0, 0, -1, 'Exposure time', 's'),
+    ('RA', 'double', 0, 0, -1, 'Right Ascension', 'deg'),
+    ('DEC', 'double', 0, 0, -1, 'Declination', 'deg'),
+    ('SHIFT_RA', 'double', 0, 0, -1, 'Shifted Right Ascension', 'deg'),
+    ('SHIFT_DEC', 'double', 0, 0, -1, 'Shifted Declination', 'deg'),
+    ('OFS_RA', 'double', 0, 0, -1, 'Offset Right Ascension', 'deg'),
+    ('OFS_DEC', 'double', 0, 0, -1, 'Offset Declination', 'deg'),
+    ('AZ', 'double', 0, 0, -1, 'Azimuth', 'deg'),
+    ('EL', 'double', 0, 0, -1, 'Elevation', 'deg'),
+    ('NCHAN', 'integer', 0, 0, -1, 'Number of channels', None),
+    ('TSYS', 'double', 0, 0, 1, 'Tsys', 'K'),
+    ('TARGET', 'string', 0, 0, -1, 'Target name', None),
+    ('ANTENNA', 'integer', 0, 0, -1, 'Antenna index', None),
+    ('SRCTYPE', 'integer', 0, 0, -1, 'Source type enum', None),
+    ('FIELD_ID', 'integer', 0, 0, -1, 'Field ID', None),
+])
+
+TABLEDESC_RW = _tabledesc([
+    ('STATISTICS', 'double', 0, 0, 2, 'Statistics', None),
+    ('FLAG', 'integer', 0, 0, 2, 'Flgas', None),
+    ('FLAG_PERMANENT', 'integer', 0, 0, 2, 'Permanent flags', None),
+    ('FLAG_SUMMARY', 'integer', 0, 0, 1, 'Actual flag', None),
+    ('NMASK', 'integer', 0, 0, -1, 'Number of mask regions', None),
+    ('MASKLIST', 'integer', 0, 0, 2, 'List of mask ranges', None),
+    ('NOCHANGE', 'integer', 0, 0, -1, 'Unchanged row or not', None),
+    ('POSGRP', 'integer', 0, 0, -1, 'Position group id', None),
+])
+
+# column names of RO and RW tables for fast membership test
+_RO_COLSET = frozenset(TABLEDESC_RO)
+_RW_COLSET = frozenset(TABLEDESC_RW)
+
+
+def _column_dtype(desc):
+    type_map = {'integer': int,
+                'double': float,
+                'string': str}
+    return list if desc.get('ndim', -1) > 0 else type_map[desc['valueType']]
+
+
+# (name, dtype) of RO and RW columns
+_RO_COLUMN_TYPES = tuple((k, _column_dtype(v)) for k, v in TABLEDESC_RO.items())
+_RW_COLUMN_TYPES = tuple((k, _column_dtype(v)) for k, v in TABLEDESC_RW.items())
 
 
 def create_table(table, name, desc, memtype='plain', nrow=0):
     ret = table.create(name, desc, memtype=memtype, nrow=nrow)
-    assert ret == True
+    assert ret
     for _colname, _coldesc in desc.items():
         if 'keywords' in _coldesc:
             table.putcolkeywords(_colname, _coldesc['keywords'])
@@ -138,10 +134,21 @@ UserFlagIndex = 2
 OnlineFlagIndex = 3
 
 
+# patterns to identify time table keywords (see timetable_key)
+TIMETABLE_SMALL_PATTERN = re.compile(r'^TIMETABLE_SMALL_')
+TIMETABLE_LARGE_PATTERN = re.compile(r'^TIMETABLE_LARGE_')
+
+
+@functools.lru_cache(maxsize=None)
+def _sanitize_name(name):
+    return name.replace('.', '_')
+
+
+@functools.lru_cache(maxsize=None)
 def timetable_key(table_type, antenna, spw, polarization=None, ms=None, field_id=None):
     key = 'TIMETABLE_%s' % table_type
     if ms is not None:
-        key = key + '_%s' % (ms.replace('.', '_'))
+        key = key + '_%s' % _sanitize_name(ms)
     if field_id is not None:
         key = key + '_FIELD%s' % field_id
     key = key + '_ANT%s_SPW%s' % (antenna, spw)
@@ -183,6 +190,9 @@ class DataTableIndexer(object):
             with casa_tools.TableReader(ro_table_name) as tb:
                 self.nrow_per_ms.append(tb.nrows())
         self.num_mses = len(self.nrow_per_ms)
+        # cumulative row offsets: serial indices of origin MS j span
+        # [self._offsets[j], self._offsets[j + 1])
+        self._offsets = numpy.concatenate(([0], numpy.cumsum(self.nrow_per_ms, dtype=numpy.int64)))
 
     def serial2perms(self, i: int) -> Tuple[str, int]:
         """
@@ -195,12 +205,9 @@ class DataTableIndexer(object):
             The basename of origin MS and the row index of the datatable for
             that MS corresponding to a given serial index.
         """
-        base = 0
-        for j in range(self.num_mses):
-            past_base = base
-            base += self.nrow_per_ms[j]
-            if i < base:
-                return self.origin_mses[j].basename, i - past_base
+        j = bisect.bisect_right(self._offsets, i) - 1
+        if 0 <= j < self.num_mses:
+            return self.origin_mses[j].basename, int(i - self._offsets[j])
 
         raise RuntimeError('Internal Consistency Error. ')
 
@@ -220,17 +227,16 @@ class DataTableIndexer(object):
         assert j < self.num_mses
         assert i < self.nrow_per_ms[j]
 
-        base = sum(self.nrow_per_ms[:j])
-        return base + i
+        return int(self._offsets[j]) + i
 
     def per_ms_index_list(self, ms, index_list):
         origin_ms = self.context.observing_run.get_ms(ms.origin_ms)
         j = self.origin_mses.index(origin_ms)
-        base = sum(self.nrow_per_ms[:j])
-        length = self.nrow_per_ms[j]
-        perms_list = numpy.where(numpy.logical_and(index_list >= base,
-                                                   index_list < base + length), index_list)
-        return perms_list - base
+        base = self._offsets[j]
+        bound = self._offsets[j + 1]
+        index_list = numpy.asarray(index_list)
+        mask = (index_list >= base) & (index_list < bound)
+        return index_list[mask] - base
 
 
 class DataTableImpl(object):
@@ -275,6 +281,17 @@ class DataTableImpl(object):
         self.memtable2 = 'DataTableImplRW%s.MemoryTable' % timestamp
         self.plaintable = ''
         self.cols = {}
+        # bound accessor methods of columns for fast dispatch
+        self._getcol = {}
+        self._putcol = {}
+        self._getcell = {}
+        self._putcell = {}
+        # cache for keyword names of RW table
+        self._kw_cache = None
+        # modification time of RO table on disk when it was copied to memory
+        self._ro_mtime = None
+        # cache for frequently accessed columns (column name -> array)
+        self._soa = {}
         # New table class instances are required to avoid accidental closure of
         # the global table tool instance, casa_tools.table
         self.tb1 = casa_tools._logging_table_cls()
@@ -292,12 +309,13 @@ class DataTableImpl(object):
         else:
             if readonly is None:
                 readonly = True
-            self.importdata2(name=name, minimal=False, readonly=readonly)
+            self.importdata(name=name, minimal=False, readonly=readonly)
 
     def __del__(self):
         # make sure that table is closed
         # LOG.debug('__del__ close CASA table...')
         self.cols.clear()
+        self.__bind_cols()
         self._close()
 
     def __len__(self):
@@ -318,7 +336,7 @@ class DataTableImpl(object):
     def position_group_id(self):
         key = 'POSGRP_REP'
         if self.haskeyword(key):
-            return numpy.max(numpy.fromiter((int(x) for x in self.getkeyword(key)), dtype=numpy.int32)) + 1
+            return max((int(x) for x in self.getkeyword(key)), default=-1) + 1
         else:
             return 0
 
@@ -348,28 +366,23 @@ class DataTableImpl(object):
             self.tb1.putkeyword(self.REFKEY, value)
 
     def __get_time_group_id(self, small=True):
-        if small:
-            subkey = 'SMALL'
-        else:
-            subkey = 'LARGE'
-        pattern = r'^TIMETABLE_%s_.*' % subkey
-        if numpy.any(numpy.fromiter((re.match(pattern, x) is not None for x in self.keywordnames()), dtype=bool)):
-            group_id = 0
-            for key in self.tb2.keywordnames():
-                if re.match(pattern, key) is not None:
-                    max_id = numpy.max(
-                        numpy.fromiter((int(x) for x in self.getkeyword(key)), dtype=numpy.int32)) + 1
-                    group_id = max(group_id, max_id)
-            return group_id
-        else:
-            return 0
+        pattern = TIMETABLE_SMALL_PATTERN if small else TIMETABLE_LARGE_PATTERN
+        group_id = 0
+        for key in self.keywordnames():
+            if pattern.match(key) is None:
+                continue
+            max_id = max((int(x) for x in self.getkeyword(key)), default=-1) + 1
+            group_id = max(group_id, max_id)
+        return group_id
 
     def haskeyword(self, name):
-        return name in self.tb2.keywordnames()
+        return name in self.keywordnames()
 
     def addrows(self, nrow):
         self.tb1.addrows(nrow)
         self.tb2.addrows(nrow)
+        self._kw_cache = None
+        self._soa.clear()
 
         # reset self.plaintable since memory table and corresponding
         # plain table have different nrows
@@ -379,13 +392,14 @@ class DataTableImpl(object):
         return list(self.cols.keys())
 
     def getcol(self, name, startrow=0, nrow=-1, rowincr=1):
-        return self.cols[name].getcol(startrow, nrow, rowincr)
+        return self._getcol[name](startrow, nrow, rowincr)
 
     def putcol(self, name, val, startrow=0, nrow=-1, rowincr=1):
-        self.cols[name].putcol(val, startrow, nrow, rowincr)
+        self._putcol[name](val, startrow, nrow, rowincr)
+        self._soa.pop(name, None)
 
     def getcell(self, name, idx):
-        return self.cols[name].getcell(idx)
+        return self._getcell[name](idx)
 
     def putcell(self, name, idx, val):
         """
@@ -393,22 +407,25 @@ class DataTableImpl(object):
         idx -- row index
         val -- value to be put
         """
-        self.cols[name].putcell(idx, val)
+        self._putcell[name](idx, val)
+        self._soa.pop(name, None)
 
     def getcolslice(self, name, blc, trc, incr, startrow=0, nrow=-1, rowincr=1):
         return self.cols[name].getcolslice(blc, trc, incr, startrow, nrow, rowincr)
 
     def putcolslice(self, name, value, blc, trc, incr, startrow=0, nrow=-1, rowincr=1):
         self.cols[name].putcolslice(value, blc, trc, incr, startrow, nrow, rowincr)
+        self._soa.pop(name, None)
 
     def getcellslice(self, name, rownr, blc, trc, incr):
         return self.cols[name].getcellslice(rownr, blc, trc, incr)
 
     def putcellslice(self, name, rownr, value, blc, trc, incr):
         self.cols[name].putcellslice(rownr, value, blc, trc, incr)
+        self._soa.pop(name, None)
 
     def getcolkeyword(self, columnname, keyword):
-        if columnname in TABLEDESC_RO:
+        if columnname in _RO_COLSET:
             return self.tb1.getcolkeyword(columnname, keyword)
         else:
             return self.tb2.getcolkeyword(columnname, keyword)
@@ -423,20 +440,34 @@ class DataTableImpl(object):
         else:
             _val = str(val)
         self.tb2.putkeyword(name, _val)
+        self._kw_cache = None
 
     def getkeyword(self, name):
         """
         name -- keyword name
         """
         _val = self.tb2.getkeyword(name)
-        val = eval(_val)
+        val = ast.literal_eval(_val)
         return val
 
+    def _col(self, name):
+        """
+        return whole column (cached)
+
+        The returned array is shared among callers so it must not be
+        modified in place.
+        """
+        if name not in self._soa:
+            self._soa[name] = self.getcol(name)
+        return self._soa[name]
+
     def keywordnames(self):
         """
         return table keyword names
         """
-        return self.tb2.keywordnames()
+        if self._kw_cache is None:
+            self._kw_cache = self.tb2.keywordnames()
+        return self._kw_cache
 
     def importdata(self, name, minimal=True, readonly=True):
         """
@@ -449,17 +480,6 @@ class DataTableImpl(object):
         self.plaintable = absolute_path(name)
         self.__init_cols(readonly=readonly)
 
-    def importdata2(self, name, minimal=True, readonly=True):
-        """
-        name -- name of DataTable to be imported
-        """
-        LOG.debug('Importing DataTable from %s...' % name)
-
-        # copy input table to memory
-        self._copyfrom2(name, minimal)
-        self.plaintable = absolute_path(name)
-        self.__init_cols(readonly=readonly)
-
     def sync(self, minimal=True):
         """
         Sync with DataTable on disk.
@@ -539,20 +559,25 @@ class DataTableImpl(object):
 
             if dirty_rows is None:
                 # process all rows
-                # FIXME: built-in range (or list) does not support .min(), .max(); should this be a numpy range?
-                dirty_rows = range(tb.nrows())
+                dirty_rows = numpy.arange(tb.nrows())
+            else:
+                dirty_rows = numpy.asarray(dirty_rows)
 
             try:
                 nrow_chunk = 2000
                 # compute number of chunks
-                nrow = dirty_rows.max() - dirty_rows.min() + 1
+                dmin = dirty_rows.min()
+                dmax = dirty_rows.max()
+                nrow = dmax - dmin + 1
                 nchunk = nrow // nrow_chunk
                 mod = nrow % nrow_chunk
-                chunks = [nrow_chunk] * nchunk + [mod]
+                chunks = [nrow_chunk] * nchunk
+                if mod > 0:
+                    chunks.append(mod)
                 # LOG.info('chunks={0} (nrow {1})'.format(chunks, nrow))
                 # for each column
                 for col in intersects:
-                    start_row = dirty_rows.min()
+                    start_row = dmin
                     for size_chunk in chunks:
                         # LOG.info('start_row {0}, size_chunk {1}'.format(start_row, size_chunk))
                         # read chunk
@@ -562,12 +587,9 @@ class DataTableImpl(object):
                         # update chunk
                         chunk_min = start_row
                         chunk_max = start_row + size_chunk - 1
-                        target_rows = dirty_rows[numpy.logical_and(chunk_min <= dirty_rows,
-                                                                   dirty_rows <= chunk_max)]
-                        for row in target_rows:
-                            chunk_index = row - start_row
-                            # LOG.info('row {0}, chunk_index {1}'.format(row, chunk_index))
-                            chunk_dst[..., chunk_index] = chunk_src[..., chunk_index]
+                        target_rows = dirty_rows[(chunk_min <= dirty_rows) & (dirty_rows <= chunk_max)]
+                        chunk_index = target_rows - start_row
+                        chunk_dst[..., chunk_index] = chunk_src[..., chunk_index]
 
                         # flush chunk
                         tb.putcol(col, chunk_dst, startrow=start_row, nrow=size_chunk)
@@ -610,52 +632,52 @@ class DataTableImpl(object):
         else:
             RO_COLUMN = RWDataTableColumn
             RW_COLUMN = RWDataTableColumn
-        type_map = {'integer': int,
-                    'double': float,
-                    'string': str}
-        datatype = lambda desc: list if 'ndim' in desc and desc['ndim'] > 0 else type_map[desc['valueType']]
-        for k, v in TABLEDESC_RO.items():
-            self.cols[k] = RO_COLUMN(self.tb1, k, datatype(v))
-        for k, v in TABLEDESC_RW.items():
+        for k, dtype in _RO_COLUMN_TYPES:
+            self.cols[k] = RO_COLUMN(self.tb1, k, dtype)
+        for k, dtype in _RW_COLUMN_TYPES:
             if k == 'MASKLIST':
                 self.cols[k] = DataTableColumnMaskList(self.tb2)
             elif k == 'NOCHANGE':
                 self.cols[k] = DataTableColumnNoChange(self.tb2)
             else:
-                self.cols[k] = RW_COLUMN(self.tb2, k, datatype(v))
+                self.cols[k] = RW_COLUMN(self.tb2, k, dtype)
+        self.__bind_cols()
+
+    def __bind_cols(self):
+        self._getcol = {k: c.getcol for k, c in self.cols.items()}
+        self._putcol = {k: c.putcol for k, c in self.cols.items()}
+        self._getcell = {k: c.getcell for k, c in self.cols.items()}
+        self._putcell = {k: c.putcell for k, c in self.cols.items()}
 
     def _close(self):
         if self.isopened:
             self.tb1.close()
             self.tb2.close()
             self.isopened = False
+        self._kw_cache = None
+        self._soa.clear()
 
     def _copyfrom(self, name, minimal=True):
-        self._close()
         abspath = absolute_path(name)
-        if not minimal or abspath != self.plaintable:
-            with casa_tools.TableReader(os.path.join(name, 'RO')) as tb:
-                self.tb1 = tb.copy(self.memtable1, deep=True,
-                                   valuecopy=True, memorytable=True,
-                                   returnobject=True)
-        with casa_tools.TableReader(os.path.join(name, 'RW')) as tb:
-            self.tb2 = tb.copy(self.memtable2, deep=True,
-                               valuecopy=True, memorytable=True,
-                               returnobject=True)
-        self.isopened = True
-
-    def _copyfrom2(self, name, minimal=True):
-        self._close()
-        abspath = absolute_path(name)
-        if not minimal or abspath != self.plaintable:
-            with casa_tools.TableReader(os.path.join(name, 'RO')) as tb:
+        rotable = self.get_rotable_name(abspath)
+        ro_mtime = os.stat(rotable).st_mtime_ns
+        # RO table is static, so on-memory copy can be reused as long as
+        # it comes from the same table and the table is not updated on disk
+        if minimal and self.isopened and abspath == self.plaintable and ro_mtime == self._ro_mtime:
+            self.tb2.close()
+        else:
+            self._close()
+            with casa_tools.TableReader(rotable) as tb:
                 self.tb1 = tb.copy(self.memtable1, deep=True,
                                    valuecopy=True, memorytable=True,
                                    returnobject=True)
-        with casa_tools.TableReader(os.path.join(name, 'RW')) as tb:
+            self._ro_mtime = ro_mtime
+        with casa_tools.TableReader(self.get_rwtable_name(abspath)) as tb:
             self.tb2 = tb.copy(self.memtable2, deep=True,
                                valuecopy=True, memorytable=True,
                                returnobject=True)
+        self._kw_cache = None
+        self._soa.clear()
         self.isopened = True
 
     def get_posdict(self, ant, spw, pol):
@@ -668,8 +690,8 @@ class DataTableImpl(object):
             raise e
 
         posgrp_rep = self.getkeyword('POSGRP_REP')
-        rows = self.getcol('ROW')
-        posgrp = self.getcol('POSGRP')
+        rows = self._col('ROW')
+        posgrp = self._col('POSGRP')
         posdict = {}
         for k, v in posgrp_rep.items():
             if int(k) not in mygrp:
@@ -677,17 +699,24 @@ class DataTableImpl(object):
             key = rows[v]
             posdict[key] = [[], []]
 
-        for idx in range(len(posgrp)):
-            grp = posgrp[idx]
-            if grp not in mygrp:
-                continue
-            row = rows[idx]
+        # select rows belonging to mygrp and sort them by group id
+        # (stable sort keeps row order within each group)
+        selected_idx = numpy.nonzero(numpy.isin(posgrp, list(mygrp)))[0]
+        order = numpy.argsort(posgrp[selected_idx], kind='stable')
+        selected_idx = selected_idx[order]
+        selected_grp = posgrp[selected_idx]
+        group_ids, group_start = numpy.unique(selected_grp, return_index=True)
+        group_end = numpy.append(group_start[1:], len(selected_idx))
+        for grp, start, end in zip(group_ids, group_start, group_end):
             rep = posgrp_rep[str(grp)]
             key = rows[rep]
-            posdict[key][0].append(row)
-            posdict[key][1].append(idx)
-            if row != key:
-                posdict[row] = [[-1, key], [rep]]
+            idx_list = selected_idx[start:end]
+            row_list = rows[idx_list].tolist()
+            posdict[key][0].extend(row_list)
+            posdict[key][1].extend(idx_list.tolist())
+            for row in row_list:
+                if row != key:
+                    posdict[row] = [[-1, key], [rep]]
 
         return posdict
 
@@ -700,7 +729,7 @@ class DataTableImpl(object):
 
         mygrp_s = mygrp['small']
         mygrp_l = mygrp['large']
-        rows = self.getcol('ROW')
+        rows = self._col('ROW')
 
         timedic_s = construct_timegroup(rows, set(mygrp_s), timegrp_s)
         timedic_l = construct_timegroup(rows, set(mygrp_l), timegrp_l)
@@ -716,9 +745,9 @@ class DataTableImpl(object):
         start_time2 = time.time()
         key_small = timetable_key('SMALL', ant, spw, pol, ms, field_id)
         key_large = timetable_key('LARGE', ant, spw, pol, ms, field_id)
-        keys = self.tb2.keywordnames()
+        keys = self.keywordnames()
         LOG.debug('add time table: keys for small gap \'%s\' large gap \'%s\'' % (key_small, key_large))
-        dictify = lambda x: dict([(str(i), t) for (i, t) in enumerate(x)])
+        dictify = lambda x: {str(i): t for (i, t) in enumerate(x)}
         if key_small not in keys or key_large not in keys:
             self.putkeyword(key_small, dictify(timetable[0]))
             self.putkeyword(key_large, dictify(timetable[1]))
@@ -732,13 +761,15 @@ class DataTableImpl(object):
         start_time = time.time()
         key_small = timetable_key('SMALL', ant, spw, pol, ms, field_id)
         key_large = timetable_key('LARGE', ant, spw, pol, ms, field_id)
-        keys = self.tb2.keywordnames()
+        keys = self.keywordnames()
         LOG.debug('get time table: keys for small gap \'%s\' large gap \'%s\'' % (key_small, key_large))
         if key_small in keys and key_large in keys:
             ttdict_small = self.getkeyword(key_small)
             ttdict_large = self.getkeyword(key_large)
-            timetable_small = [ttdict_small[str(i)] for i in range(len(ttdict_small))]
-            timetable_large = [ttdict_large[str(i)] for i in range(len(ttdict_large))]
+            # keys are serial numbers that are stored in order by set_timetable
+            # and ast.literal_eval preserves that order
+            timetable_small = list(ttdict_small.values())
+            timetable_large = list(ttdict_large.values())
             timetable = [timetable_small, timetable_large]
         else:
             raise RuntimeError('time table for Antenna %s spw %s pol %s is not configured properly' % (ant, spw, pol))
@@ -759,9 +790,10 @@ class DataTableImpl(object):
             except Exception as e:
                 raise e
         else:
+            mskey = _sanitize_name(ms.basename)
             try:
-                mygap_s = timegap_s[ms.basename.replace('.', '_')][ant][spw][field_id]
-                mygap_l = timegap_l[ms.basename.replace('.', '_')][ant][spw][field_id]
+                mygap_s = timegap_s[mskey][ant][spw][field_id]
+                mygap_l = timegap_l[mskey][ant][spw][field_id]
             except KeyError:
                 raise KeyError(
                     'ms %s field %s ant %s spw %s not in reduction group list' % (ms.basename, field_id, ant, spw))
@@ -769,12 +801,9 @@ class DataTableImpl(object):
                 raise e
 
         if asrow:
-            rows = self.getcol('ROW')
-            timegap = [[], []]
-            for idx in mygap_s:
-                timegap[0].append(rows[idx])
-            for idx in mygap_l:
-                timegap[1].append(rows[idx])
+            rows = self._col('ROW')
+            timegap = [rows[numpy.asarray(mygap_s, dtype=numpy.intp)].tolist(),
+                       rows[numpy.asarray(mygap_l, dtype=numpy.intp)].tolist()]
         else:
             timegap = [mygap_s, mygap_l]
         return timegap
@@ -817,17 +846,25 @@ class DataTableImpl(object):
                     from_fields = [atm_fields[i].id for i in nearest_id]
                 else:
                     # more generic case that requires to search nearest field by separation
-                    rmin = casa_tools.quanta.quantity(180.0, 'deg')
                     origin = to_field.mdirection
                     nearest_id = -1
-                    for f in atm_fields:
-                        r = casa_tools.measures.separation(origin, f.mdirection)
-                        #LOG.info('before test: rmin {} r {} nearest_id {}'.format(rmin['value'], r['value'], nearest_id))
-                        # quanta.le is equivalent to <=
-                        if casa_tools.quanta.le(r, rmin):
-                            rmin = r
-                            nearest_id = f.id
-                        #LOG.info('after test: rmin {} r {} nearest_id {}'.format(rmin['value'], r['value'], nearest_id))
+                    if all(f.mdirection['refer'] == origin['refer'] for f in atm_fields):
+                        # chord distance between unit vectors is monotonic with
+                        # angular separation so that it gives the same nearest field
+                        if len(atm_fields) > 0:
+                            origin_vec = _direction_to_unit_vector(origin)
+                            diff = numpy.array([_direction_to_unit_vector(f.mdirection) for f in atm_fields]) - origin_vec
+                            chord2 = numpy.einsum('ij,ij->i', diff, diff)
+                            # take the last one in case of tie
+                            nearest_id = atm_fields[len(atm_fields) - 1 - int(numpy.argmin(chord2[::-1]))].id
+                    else:
+                        rmin = casa_tools.quanta.quantity(180.0, 'deg')
+                        for f in atm_fields:
+                            r = casa_tools.measures.separation(origin, f.mdirection)
+                            # quanta.le is equivalent to <=
+                            if casa_tools.quanta.le(r, rmin):
+                                rmin = r
+                                nearest_id = f.id
                     if nearest_id != -1:
                         from_fields = [nearest_id]
                     else:
@@ -842,25 +879,33 @@ class DataTableImpl(object):
             times = tsel.getcol('TIME')
             #fieldids = tsel.getcol('FIELD_ID')
             antids = tsel.getcol('ANTENNA1')
-            tsys_masked = {}
-            for i in range(tsel.nrows()):
-                tsys = tsel.getcell('FPARAM', i)
-                flag = tsel.getcell('FLAG', i)
-                tsys_masked[i] = numpy.ma.masked_array(tsys, mask=(flag == True))
+            # Tsys and flag are read per spw since FPARAM has a fixed shape
+            # only within spw. Arrays are stored with shape (nrow, npol, nchan).
+            tsys_spw = {}
+            flag_spw = {}
+            # index of each caltable row in the per-spw arrays
+            spw_row_index = numpy.empty(len(spws), dtype=int)
+            for spw in numpy.unique(spws).tolist():
+                spw_rows = numpy.where(spws == spw)[0]
+                spw_row_index[spw_rows] = numpy.arange(len(spw_rows))
+                ssel = tsel.query('SPECTRAL_WINDOW_ID == {}'.format(spw))
+                try:
+                    tsys_spw[spw] = ssel.getcol('FPARAM').transpose(2, 0, 1)
+                    flag_spw[spw] = ssel.getcol('FLAG').transpose(2, 0, 1)
+                finally:
+                    ssel.close()
             tsel.close()
 
-        #LOG.info('tsys={}'.format(tsys_masked))
-
         def map_spwchans(atm_spw, science_spw):
             """
             Map the channel ID ranges of ATMCal spw that covers frequency range of a science spw
             Arguments: spw object of ATMCal and science spws
             """
-            atm_freqs = numpy.array(atm_spw.channels.chan_freqs)
-            min_chan = numpy.where(abs(atm_freqs - float(science_spw.min_frequency.value)) == min(
-                abs(atm_freqs - float(science_spw.min_frequency.value))))[0][0]
-            max_chan = numpy.where(abs(atm_freqs - float(science_spw.max_frequency.value)) == min(
-                abs(atm_freqs - float(science_spw.max_frequency.value))))[0][-1]
+            atm_freqs = numpy.asarray(atm_spw.channels.chan_freqs)
+            min_chan = int(numpy.argmin(numpy.abs(atm_freqs - float(science_spw.min_frequency.value))))
+            # take the last channel in case of tie
+            max_chan = len(atm_freqs) - 1 - int(
+                numpy.argmin(numpy.abs(atm_freqs[::-1] - float(science_spw.max_frequency.value))))
             start_atmchan = min(min_chan, max_chan)
             end_atmchan = max(min_chan, max_chan)
             # LOG.trace('calculate_average_tsys:   satrt_atmchan == %d' % start_atmchan)
@@ -869,52 +914,62 @@ class DataTableImpl(object):
                 end_atmchan = start_atmchan + 1
             return start_atmchan, end_atmchan
 
-        _dt_antenna = self.getcol('ANTENNA')
-        _dt_spw = self.getcol('IF')
-        dt_field = self.getcol('FIELD_ID')
-        field_sel = numpy.where(dt_field == to_fieldid)[0]
+        _dt_antenna = self._col('ANTENNA')
+        _dt_spw = self._col('IF')
+        dt_field = self._col('FIELD_ID')
+        dt_time = self._col('TIME')
+        field_sel = _select_field_rows(dt_field, to_fieldid)
         dt_antenna = _dt_antenna[field_sel]
         dt_spw = _dt_spw[field_sel]
-        atm_spws = set(spws)
-        science_spws = [x.id for x in msobj.get_spectral_windows(science_windows_only=True)]
-        for spw_to, spw_from in enumerate(spwmap):
-            # only process atm spws
-            if spw_from not in atm_spws:
-                continue
-
-            # only process science spws
-            if spw_to not in science_spws:
-                continue
-
-            atm_spw = msobj.get_spectral_window(spw_from)
-            science_spw = msobj.get_spectral_window(spw_to)
-            science_dd = msobj.get_data_description(spw=science_spw)
+        atm_spws = set(spws.tolist())
+        # caltable rows sorted by (spw, antenna) for fast selection by
+        # binary search. lexsort is stable so row order is kept for each pair.
+        cal_key_base = int(max(antids.max(initial=0), max(to_antids, default=0))) + 1
+        cal_order = numpy.lexsort((antids, spws))
+        cal_keys = spws[cal_order].astype(numpy.int64) * cal_key_base + antids[cal_order]
+        science_spws = set(x.id for x in msobj.get_spectral_windows(science_windows_only=True))
+        # lookup tables to avoid linear search of spw and data description per spw
+        spw_cache = {x.id: x for x in msobj.spectral_windows}
+        dd_cache = {}
+        for dd in msobj.data_descriptions:
+            dd_cache.setdefault(dd.spw.id, dd)
+        # only process pairs of science spw and atm spw
+        spw_pairs = [(spw_to, spw_from) for spw_to, spw_from in enumerate(spwmap)
+                     if spw_from in atm_spws and spw_to in science_spws]
+        for spw_to, spw_from in spw_pairs:
+            atm_spw = spw_cache[spw_from]
+            science_spw = spw_cache[spw_to]
+            science_dd = dd_cache[spw_to]
             corr_index = [science_dd.get_polarization_id(corr) for corr in science_dd.corr_axis]
             start_atmchan, end_atmchan = map_spwchans(atm_spw, science_spw)
             LOG.info('Transfer Tsys from spw {} (chans: {}~{}) to {}'.format(spw_from, start_atmchan, end_atmchan, spw_to))
             for ant_to in to_antids:
                 # select caltable row id by SPW and ANT
-                cal_idxs = numpy.where(numpy.logical_and(spws == spw_from, antids == ant_to))[0]
+                cal_key = spw_from * cal_key_base + ant_to
+                cal_idxs = cal_order[numpy.searchsorted(cal_keys, cal_key, side='left'):
+                                     numpy.searchsorted(cal_keys, cal_key, side='right')]
                 if len(cal_idxs) == 0:
                     continue
+                chan_sel = numpy.s_[:, corr_index, start_atmchan:end_atmchan+1]
+                spw_idxs = spw_row_index[cal_idxs]
+                tsys_sel = tsys_spw[spw_from][spw_idxs][chan_sel]
+                valid_sel = numpy.logical_not(flag_spw[spw_from][spw_idxs][chan_sel])
                 # atsys.shape = (nrow, npol)
-                atsys = numpy.asarray([tsys_masked[i].take(corr_index, axis=0)[:, start_atmchan:end_atmchan+1].mean(axis=1).data
-                                           for i in cal_idxs])
+                atsys = _masked_mean(tsys_sel, valid_sel)
                 dtrows = field_sel[numpy.where(numpy.logical_and(dt_antenna == ant_to, dt_spw == spw_to))[0]]
                 #LOG.info('ant {} spw {} dtrows {}'.format(ant_to, spw_to, len(dtrows)))
                 time_sel = times.take(cal_idxs)  # in sec
-                for dt_id in dtrows:
-                    #LOG.info('ant {} spw {} field {}'.format(self.getcell('ANTENNA', dt_id),
-                    #                                         self.getcell('IF', dt_id),
-                    #                                         self.getcell('FIELD_ID', dt_id)))
-                    tref = self.getcell('TIME', dt_id) * 86400  # day->sec
-                    # LOG.trace("cal_field_ids=%s" % cal_field_idxs)
-                    # LOG.trace('atsys = %s' % str(atsys))
-                    if atsys.shape[0] == 1:  # only one Tsys measurement selected
-                        self.putcell('TSYS', dt_id, atsys[0, :])
-                    else:
-                        itsys = _interpolate(atsys, time_sel, tref)
-                        self.putcell('TSYS', dt_id, itsys)
+                trefs = dt_time[dtrows] * 86400  # day->sec
+                # LOG.trace('atsys = %s' % str(atsys))
+                # itsys.shape = (len(dtrows), npol)
+                itsys = _interpolate(atsys, time_sel, trefs)
+                # write Tsys by contiguous run of rows
+                # (putcol takes an array of shape (npol, nrow))
+                breaks = numpy.where(numpy.diff(dtrows) != 1)[0] + 1
+                for rows_run, tsys_run in zip(numpy.split(dtrows, breaks), numpy.split(itsys, breaks)):
+                    if len(rows_run) == 0:
+                        continue
+                    self.putcol('TSYS', tsys_run.T, startrow=rows_run[0], nrow=len(rows_run))
         end_time = time.time()
         LOG.info('_update_tsys: elapsed {} sec'.format(end_time - start_time))
 
@@ -931,28 +986,37 @@ class DataTableImpl(object):
         filename = self.getkeyword('FILENAME')
         assert os.path.basename(infile) == os.path.basename(filename)
 
-        # back to previous impl. with reduced memory usage
-        # (performance degraded)
-        ms_rows = self.getcol('ROW')
-        tmp_array = numpy.empty((4, 1,), dtype=numpy.int32)
+        # FLAG is read by chunk of rows to limit memory usage.
+        # Rows are grouped by spw and npol so that FLAG has fixed shape
+        # within each chunk.
+        nrow_chunk = 1000
+        ms_rows = self._col('ROW')
+        dt_spw = self._col('IF')
+        dt_npol = self._col('NPOL')
         with casa_tools.TableReader(infile) as tb:
-            # for dt_row in index[0]:
-            for dt_row, ms_row in enumerate(ms_rows):
-                # ms_row = rows[dt_row]
-                flag = tb.getcell('FLAG', ms_row)
-                rowflag = tb.getcell('FLAG_ROW', ms_row)
-                # irow += 1
-                npol = flag.shape[0]
-                #online_flag = numpy.empty((npol, 1,), dtype=numpy.int32)
-                online_flag = tmp_array[:npol, :]
-                if rowflag == True:
-                    online_flag[:] = 0
-                else:
-                    for ipol in range(npol):
-                        online_flag[ipol, 0] = 0 if flag[ipol].all() else 1
-                self.putcellslice('FLAG_PERMANENT', int(dt_row), online_flag,
-                                  blc=[0, OnlineFlagIndex], trc=[npol - 1, OnlineFlagIndex],
-                                  incr=[1, 1])
+            for spw, npol in sorted(set(zip(dt_spw.tolist(), dt_npol.tolist()))):
+                dt_rows = numpy.where((dt_spw == spw) & (dt_npol == npol))[0]
+                for start in range(0, len(dt_rows), nrow_chunk):
+                    dt_chunk = dt_rows[start:start + nrow_chunk]
+                    tsel = tb.selectrows(ms_rows[dt_chunk].tolist())
+                    try:
+                        # flag.shape = (npol, nchan, nrow)
+                        flag = tsel.getcol('FLAG')
+                        rowflag = tsel.getcol('FLAG_ROW')
+                    finally:
+                        tsel.close()
+                    # online_flag.shape = (npol, nrow), 1 is valid and 0 is invalid
+                    online_flag = numpy.logical_not(
+                        numpy.logical_or(flag.all(axis=1), rowflag)).astype(numpy.int32)
+                    npol_flag = online_flag.shape[0]
+                    # write by contiguous run of rows
+                    # (putcolslice takes an array of shape (npol, 1, nrow))
+                    breaks = numpy.where(numpy.diff(dt_chunk) != 1)[0] + 1
+                    for start_run, end_run in zip(numpy.append(0, breaks), numpy.append(breaks, len(dt_chunk))):
+                        self.putcolslice('FLAG_PERMANENT', online_flag[:, numpy.newaxis, start_run:end_run],
+                                         blc=[0, OnlineFlagIndex], trc=[npol_flag - 1, OnlineFlagIndex],
+                                         incr=[1, 1], startrow=int(dt_chunk[start_run]),
+                                         nrow=int(end_run - start_run))
 
 
 class RODataTableColumn(object):
@@ -1047,8 +1111,21 @@ class DataTableColumnMaskList(RWDataTableColumn):
         if nrow < 0:
             nrow = self.tb.nrows()
         ret = collections.defaultdict(list)
+        row_range = range(startrow, nrow, rowincr)
+        if len(row_range) == 0:
+            return ret
+        try:
+            # raw.shape = (nmask, 2, nrow). this fails if nmask differs among rows
+            raw = self.tb.getcol(self.name, startrow, len(row_range), rowincr)
+        except RuntimeError:
+            raw = None
+        if raw is not None:
+            if raw.shape[0] == 1:
+                for idx in numpy.where((raw[0, 0] == 0) & (raw[0, 1] == 0))[0]:
+                    ret[int(idx)] = raw[..., idx]
+            return ret
         idx = 0
-        for i in range(startrow, nrow, rowincr):
+        for i in row_range:
             tMASKLIST = self.getcell(i)
             if len(tMASKLIST) == 1 and tMASKLIST[0][0] == 0 and \
                     tMASKLIST[0][1] == 0:
@@ -1072,32 +1149,91 @@ class DataTableColumnMaskList(RWDataTableColumn):
             nrow = min(startrow + len(val) * rowincr, self.tb.nrows())
         idx = 0
         for i in range(startrow, nrow, rowincr):
-            self.putcell(i, numpy.asarray(val[idx]))
+            self.putcell(i, val[idx])
             idx += 1
 
 
+def _direction_to_unit_vector(direction):
+    """
+    Convert direction measure to unit vector in Cartesian coordinate.
+
+    Arguments
+        direction: direction measure
+    Returns
+        unit vector as numpy array with shape (3,)
+    """
+    qa = casa_tools.quanta
+    lon = qa.convert(direction['m0'], 'rad')['value']
+    lat = qa.convert(direction['m1'], 'rad')['value']
+    return numpy.array([numpy.cos(lat) * numpy.cos(lon),
+                        numpy.cos(lat) * numpy.sin(lon),
+                        numpy.sin(lat)])
+
+
+def _select_field_rows(field_ids, to_fieldid):
+    """
+    Return indices of rows whose FIELD_ID matches the given field(s).
+
+    Arguments
+        field_ids: FIELD_ID of each row
+        to_fieldid: a single FIELD_ID or a list of FIELD_IDs
+    Returns
+        row indices as numpy array
+    """
+    return numpy.where(numpy.isin(field_ids, to_fieldid))[0]
+
+
+def _masked_mean(v, valid):
+    """
+    Average v along the last axis taking into account validity of each element.
+
+    Arguments
+        v: values to be averaged
+        valid: boolean array with the same shape as v, True for valid elements
+    Returns
+        average of valid elements. Zero is returned where all elements are invalid.
+    """
+    nvalid = valid.sum(axis=-1)
+    vsum = numpy.where(valid, v, 0).sum(axis=-1)
+    return numpy.divide(vsum, nvalid, out=numpy.zeros(vsum.shape, dtype=vsum.dtype), where=nvalid > 0)
+
+
 def _interpolate(v, t, tref):
-    # bisect.bisect_left(a, x)
-    # bisect_left returns an insertion point of x in a.
-    # if x matches any value in a, bisect_left returns its index.
-    # (bisect_right and bisect returns index next to the matched value)
-    idx = bisect.bisect_left(t, tref)
-    #LOG.info('len(t) = {}, idx = {}'.format(len(t), idx))
-    if idx == 0:
-        return v[0]
-    elif idx == len(t):
-        return v[-1]
-    else:
-        t1 = t[idx] - tref
-        t0 = tref - t[idx - 1]
-        return (v[idx] * t0 + v[idx-1] * t1) / (t[idx] - t[idx-1])
+    """
+    Linearly interpolate v in time.
+
+    Values outside the range of t are clipped to the first or last
+    element of v.
+
+    Arguments
+        v: values to be interpolated, shape (len(t), npol)
+        t: time of each element of v
+        tref: list of times to which v is interpolated
+    Returns
+        interpolated values, shape (len(tref), npol)
+    """
+    if len(t) == 1:  # only one measurement available
+        return numpy.repeat(v[:1], len(tref), axis=0)
+    order = numpy.argsort(t, kind='stable')
+    t = t[order]
+    v = v[order]
+    ret = numpy.empty((len(tref), v.shape[1]), dtype=v.dtype)
+    for ipol in range(v.shape[1]):
+        ret[:, ipol] = numpy.interp(tref, t, v[:, ipol])
+    return ret
 
 
 def construct_timegroup(rows, group_id_list, group_association_list):
     timetable_dict = {x: [[], []] for x in group_id_list}
-    for (idx, group_id) in enumerate(group_association_list):
-        if group_id not in group_id_list:
-            continue
-        timetable_dict[group_id][0].append(rows[idx])
-        timetable_dict[group_id][1].append(idx)
+    rows = numpy.asarray(rows)
+    group_association = numpy.asarray(group_association_list)
+    # indices of rows belonging to group_id_list sorted by group id
+    # (stable sort keeps row order within each group)
+    idx = numpy.nonzero(numpy.isin(group_association, list(group_id_list)))[0]
+    idx = idx[numpy.argsort(group_association[idx], kind='stable')]
+    group_ids, group_start = numpy.unique(group_association[idx], return_index=True)
+    group_end = numpy.append(group_start[1:], len(idx))
+    for group_id, start, end in zip(group_ids.tolist(), group_start, group_end):
+        group_idx = idx[start:end]
+        timetable_dict[group_id] = [rows[group_idx].tolist(), group_idx.tolist()]
     return timetable_dict
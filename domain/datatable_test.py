@@ -0,0 +1,112 @@
+import collections
+import unittest.mock as mock
+
+import numpy
+import pytest
+
+import pipeline.domain.datatable as datatable
+
+MeasurementSetMock = collections.namedtuple(
+    'MeasurementSetMock',
+    ['name', 'basename', 'origin_ms']
+)
+
+# three origin MSes, the second one without any rows
+NROWS = {'a.ms': 3, 'b.ms': 0, 'c.ms': 4}
+MSES = [MeasurementSetMock(name=name, basename=name, origin_ms=name) for name in NROWS]
+
+
+class TableReaderMock(object):
+    """Return the number of rows of the RO table of an MS from NROWS."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def nrows(self):
+        return NROWS[self.name.split('/')[-2]]
+
+
+def get_ms(name):
+    return next(ms for ms in MSES if ms.name == name)
+
+
+@pytest.fixture
+def indexer():
+    context = mock.MagicMock()
+    context.observing_run.measurement_sets = MSES
+    context.observing_run.ms_datatable_name = 'datatable'
+    context.observing_run.get_ms = get_ms
+    with mock.patch.object(datatable.casa_tools, 'TableReader', TableReaderMock):
+        return datatable.DataTableIndexer(context)
+
+
+# serial indices 0-2 belong to a.ms and 3-6 to c.ms; -1 and 7 are out of range
+params_per_ms_index_list = [
+    ('a.ms', [0, 2], [0, 2]),
+    ('c.ms', [3, 6], [0, 3]),
+    ('a.ms', [-1, 0, 1, 2, 3, 5, 6, 7], [0, 1, 2]),
+    ('b.ms', [-1, 0, 1, 2, 3, 5, 6, 7], []),
+    ('c.ms', [-1, 0, 1, 2, 3, 5, 6, 7], [0, 2, 3]),
+    ('c.ms', [], []),
+]
+
+
+@pytest.mark.parametrize("vis, index_list, expected", params_per_ms_index_list)
+def test_per_ms_index_list(indexer, vis, index_list, expected):
+    """Test DataTableIndexer.per_ms_index_list()
+
+    Serial indices are converted to row indices of the given MS. Indices
+    belonging to other MSes or lying outside the serial index range are
+    dropped, and an MS without rows gets an empty list.
+    """
+    result = indexer.per_ms_index_list(get_ms(vis), index_list)
+    assert numpy.array_equal(result, expected)
+
+
+params_serial2perms = [(0, ('a.ms', 0)), (2, ('a.ms', 2)), (3, ('c.ms', 0)), (6, ('c.ms', 3))]
+
+
+@pytest.mark.parametrize("serial_index, expected", params_serial2perms)
+def test_serial2perms(indexer, serial_index, expected):
+    """Test DataTableIndexer.serial2perms() and its inverse perms2serial()
+
+    The MS without rows is skipped when mapping serial indices.
+    """
+    assert indexer.serial2perms(serial_index) == expected
+    assert indexer.perms2serial(*expected) == serial_index
+
+
+@pytest.mark.parametrize("serial_index", [-1, 7])
+def test_serial2perms_out_of_range(indexer, serial_index):
+    """Test DataTableIndexer.serial2perms() for serial indices outside the valid range"""
+    with pytest.raises(RuntimeError):
+        indexer.serial2perms(serial_index)
+
+
+FIELD_IDS = numpy.array([0, 1, 2, 1, 0, 2, 3])
+params_select_field_rows = [
+    (1, [1, 3]),
+    (numpy.int64(2), [2, 5]),
+    ([1], [1, 3]),
+    ([0, 2], [0, 2, 4, 5]),
+    ((3, 1), [1, 3, 6]),
+    ([4], []),
+    ([], []),
+]
+
+
+@pytest.mark.parametrize("to_fieldid, expected", params_select_field_rows)
+def test_select_field_rows(to_fieldid, expected):
+    """Test _select_field_rows()
+
+    Rows are selected for a single field ID as well as for a list of
+    field IDs, as passed by hsd_applycal when transferring Tsys.
+    """
+    result = datatable._select_field_rows(FIELD_IDS, to_fieldid)
+    assert numpy.array_equal(result, expected)
@@ -569,8 +569,6 @@ def estimate_near_field_SNR(imagename, las=None, maskname=None, verbose=True, mo
                    expr="IM0*IM1/IM2")
         image_stats = cts.imstat(imagename="temp.image")
         shutil.rmtree("temp.image", ignore_errors=True)
-    else:
-        image_stats = cts.imstat(imagename=imagename)
 
     goodMask = checkmask(maskImage)
     if not goodMask:
@@ -642,6 +642,28 @@ class ImageParamsHeuristics(object):
         if vislist is None:
             vislist = self.vislist
 
+        selections = {vis: [(field_intent, spwspec) for field_intent in field_intent_list] for vis in vislist}
+        valid_selections = self.has_data_batch(selections)
+
+        valid_data = {}
+        for field_intent in field_intent_list:
+            valid_data[field_intent] = any(valid_selections[(vis, field_intent, spwspec)] for vis in vislist)
+            if not valid_data[field_intent]:
+                LOG.debug('No data for SpW %s field %s' %
+                          (spwspec, field_intent[0]))
+
+        return valid_data
+
+    def has_data_batch(self, selections):
+        """Check a set of vis/field/intent/spw selections for unflagged data.
+
+        The scan and antenna selections only depend on the MS and the
+        field/intent and are thus determined once per MS rather than once
+        per selection.
+
+        :param selections: dictionary of vis -> list of (field_intent, spwspec) tuples
+        :return: dictionary of (vis, field_intent, spwspec) -> True/False
+        """
         # reset state of imager
         casa_tools.imager.done()
 
@@ -650,22 +672,28 @@ class ImageParamsHeuristics(object):
         valid_data = {}
         try:
             # select data to be imaged
-            for field_intent in field_intent_list:
-                valid_data[field_intent] = False
-                for vis in vislist:
-                    ms = self.observing_run.get_ms(name=vis)
-                    scanids = [str(scan.id) for scan in ms.scans if
-                               field_intent[1] in scan.intents and
-                               field_intent[0] in [fld.name for fld in scan.fields]]
-                    if scanids != []:
-                        scanids = ','.join(scanids)
+            for vis, field_intent_spwspecs in selections.items():
+                ms = self.observing_run.get_ms(name=vis)
+                scanids_per_field_intent = {}
+                taql_per_intent = {}
+                for field_intent, spwspec in field_intent_spwspecs:
+                    valid_data[(vis, field_intent, spwspec)] = False
+                    if field_intent not in scanids_per_field_intent:
+                        scanids_per_field_intent[field_intent] = ','.join(
+                            [str(scan.id) for scan in ms.scans if
+                             field_intent[1] in scan.intents and
+                             field_intent[0] in [fld.name for fld in scan.fields]])
+                    scanids = scanids_per_field_intent[field_intent]
+                    if scanids != '':
                         real_spwspec = ','.join([str(self.observing_run.virtual2real_spw_id(spwid, ms)) for spwid in spwspec.split(',')])
                         try:
-                            antenna_ids = self.antenna_ids(field_intent[1], [os.path.basename(vis)])
-                            taql = f"{'||'.join(['ANTENNA1==%d' % i for i in antenna_ids[os.path.basename(vis)]])}&&" \
-                                   f"{'||'.join(['ANTENNA2==%d' % i for i in antenna_ids[os.path.basename(vis)]])}"
+                            if field_intent[1] not in taql_per_intent:
+                                antenna_ids = self.antenna_ids(field_intent[1], [os.path.basename(vis)])
+                                taql_per_intent[field_intent[1]] = \
+                                    f"{'||'.join(['ANTENNA1==%d' % i for i in antenna_ids[os.path.basename(vis)]])}&&" \
+                                    f"{'||'.join(['ANTENNA2==%d' % i for i in antenna_ids[os.path.basename(vis)]])}"
                             rtn = casa_tools.imager.selectvis(vis=vis, field=field_intent[0],
-                                                              taql=taql, spw=real_spwspec,
+                                                              taql=taql_per_intent[field_intent[1]], spw=real_spwspec,
                                                               scan=scanids, usescratch=False, writeaccess=False)
                             if rtn is True:
                                 aipsfieldofview = '%4.1farcsec' % (2.0 * self.largest_primary_beam_size(spwspec, field_intent[1]))
@@ -674,14 +702,10 @@ class ImageParamsHeuristics(object):
                                                                fieldofview=aipsfieldofview)
                                 casa_tools.imager.done()
                                 if rtn[0]:
-                                    valid_data[field_intent] = True
+                                    valid_data[(vis, field_intent, spwspec)] = True
                         except:
                             pass
 
-                if not valid_data[field_intent]:
-                    LOG.debug('No data for SpW %s field %s' %
-                              (spwspec, field_intent[0]))
-
         finally:
             casa_tools.imager.done()
 
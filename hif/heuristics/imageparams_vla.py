@@ -8,7 +8,7 @@ import numpy as np
 import pipeline.domain.measures as measures
 import pipeline.infrastructure as infrastructure
 import pipeline.infrastructure.filenamer as filenamer
-from pipeline.infrastructure import casa_tasks, casa_tools
+from pipeline.infrastructure import casa_tasks, casa_tools, logging
 from pipeline.infrastructure.tablereader import find_EVLA_band
 
 from .auto_selfcal.selfcal_helpers import estimate_near_field_SNR, estimate_SNR
@@ -16,23 +16,64 @@ from .imageparams_base import ImageParamsHeuristics
 
 LOG = infrastructure.get_logger(__name__)
 
+# spw IDs in a comma/space separated spw selection string
+_SPWID_PATTERN = re.compile(r"[ ,]+(\d+)")
+
 
 class ImageParamsHeuristicsVLA(ImageParamsHeuristics):
 
+    # Baseline length percentiles used by get_nfrms_multiplier (5th) and wprojplanes (75th)
+    _BASELINE_PERCENTILES = (5., 75.)
+
+    # tclean robust by specmode; PIPE-1346: use robust=2.0 for VLA cube imaging.
+    _ROBUST = {'cube': 2.0, 'repBW': 2.0}
+    _ROBUST_DEFAULT = 0.5
+
+    # tclean (pblimit_image, pblimit_cleanmask) by specmode
+    _PBLIMITS = {'cube': (0.2, 0.3)}
+    _PBLIMITS_DEFAULT = (-0.1, 0.3)
+
+    # tclean nsigma by hm_masking; PIPE-678: VLA 'none' set to 5.0,
+    # PIPE-677: VLA automasking set to 4.0, reduce from 5.0
+    _NSIGMA = {'auto': 4.0}
+    _NSIGMA_DEFAULT = 5.0
+
     def __init__(self, vislist, spw, observing_run, imagename_prefix='', proj_params=None, contfile=None,
                  linesfile=None, imaging_params={}):
         ImageParamsHeuristics.__init__(self, vislist, spw, observing_run, imagename_prefix, proj_params, contfile,
                                        linesfile, imaging_params)
         self.imaging_mode = 'VLA'
+        self._qa = casa_tools.quanta
+        # visstat results keyed on the call arguments, see _visstat()
+        self._visstat_cache = {}
+        # real spw IDs keyed on (MS name, virtual spw ID), see _real_spw_id()
+        self._v2r_cache = {}
+        # spw frequency limits keyed on spwspec, see get_min_max_freq()
+        self._freq_limits_cache = {}
+        # baseline length percentiles in meter, see _percentile_baseline_length()
+        self._baseline_percentiles_cache = {}
+        # VLA band names keyed on spwspec, see _get_vla_band()
+        self._vla_band_cache = {}
 
     def robust(self, specmode=None) -> float:
         """Tclean robust parameter heuristics.
         See PIPE-680 and CASR-543"""
-        if specmode in ('cube', 'repBW'):
-            # PIPE-1346: use robust=2.0 for VLA cube imaging.
-            return 2.0
-        else:
-            return 0.5
+        return self._ROBUST.get(specmode, self._ROBUST_DEFAULT)
+
+    def _visstat(self, **stat_arg) -> dict:
+        """Run visstat, reusing the result of an identical earlier call."""
+        key = tuple(sorted(stat_arg.items()))
+        if key not in self._visstat_cache:
+            job = casa_tasks.visstat(**stat_arg)
+            self._visstat_cache[key] = job.execute()
+        return self._visstat_cache[key]
+
+    def _real_spw_id(self, spwid, ms) -> Optional[int]:
+        """Translate a virtual spw ID to the real one of the given MS, caching the result."""
+        key = (ms.name, int(spwid))
+        if key not in self._v2r_cache:
+            self._v2r_cache[key] = self.observing_run.virtual2real_spw_id(spwid, ms)
+        return self._v2r_cache[key]
 
     def uvtaper(self, beam_natural=None, protect_long=None, beam_user=None, tapering_limit=None, repr_freq=None) -> Union[str, list]:
         """Tclean uvtaper parameter heuristics."""
@@ -62,14 +103,14 @@ class ImageParamsHeuristicsVLA(ImageParamsHeuristics):
             stat_arg = {'vis': vis, 'uvrange': uvrange, 'axis': axis,
                         'useflags': True, 'field': field, 'spw': spw,
                         'correlation': 'LL,RR'}
-            job = casa_tasks.visstat(**stat_arg)
-            stats = job.execute()  # returns stat in meter
+            stats = self._visstat(**stat_arg)  # returns stat in meter
 
             # Get means of spectral windows with data in the selected uvrange
-            spws_means = [v['mean'] for (k, v) in stats.items() if np.isfinite(v['mean'])]
+            spws_means = np.fromiter((v['mean'] for v in stats.values()), dtype=np.float64, count=len(stats))
+            spws_means = spws_means[np.isfinite(spws_means)]
 
             # Determine mean and 95% percentile
-            mean = np.mean(spws_means)
+            mean = spws_means.mean()
             percentile_95 = np.percentile(spws_means, 95)
 
             return (mean, percentile_95)
@@ -77,14 +118,13 @@ class ImageParamsHeuristicsVLA(ImageParamsHeuristics):
         if not field:
             field = ''
         if spwspec:
-            spwids = sorted(set(spwspec.split(',')), key=int) # list
+            spwids = sorted({int(spwid) for spwid in spwspec.split(',')}) # list
         else:
             spwids = self.spwids # set
         #
-        qa = casa_tools.quanta
+        qa = self._qa
         #
-        LOG.info('Computing uvrange heuristics for field="{:s}", spwsids={:s}'.format(
-            field, ','.join([str(spw) for spw in spwids])))
+        LOG.info('Computing uvrange heuristics for field="%s", spwsids=%s', field, ','.join(map(str, spwids)))
 
         # Can it be that more than one visibility (ms file) is used?
         vis = self.vislist[0]
@@ -93,28 +133,26 @@ class ImageParamsHeuristicsVLA(ImageParamsHeuristics):
         # Determine the largest covered baseline in klambda. Assume that
         # the maximum baseline is associated with the highest frequency spw.
         light_speed = qa.getvalue(qa.convert(qa.constants('c'), 'm/s'))[0]
-        max_mean_freq_Hz = 0.0   # spw mean frequency in the highest frequency spw
-        real_spwids = []
-        for spwid in spwids:
-            real_spwid = self.observing_run.virtual2real_spw_id(spwid, ms)
-            spw = ms.get_spectral_window(real_spwid)
-            real_spwids.append(real_spwid)
-            mean_freq_Hz = spw.mean_frequency.to_units(measures.FrequencyUnits.HERTZ)
-            if float(mean_freq_Hz) > max_mean_freq_Hz:
-                max_mean_freq_Hz = float(mean_freq_Hz)
-                max_freq_spw = real_spwid
+        real_spwids = [self._real_spw_id(spwid, ms) for spwid in spwids]
+        mean_freqs_Hz = np.array(
+            [float(ms.get_spectral_window(real_spwid).mean_frequency.to_units(measures.FrequencyUnits.HERTZ))
+             for real_spwid in real_spwids], dtype=np.float64)
         # List of real spws
         real_spwids_str = ','.join([str(spw) for spw in real_spwids])
 
         # Check for maximum frequency
+        max_mean_freq_Hz = 0.0   # spw mean frequency in the highest frequency spw
+        if mean_freqs_Hz.size > 0:
+            imax = int(mean_freqs_Hz.argmax())
+            max_mean_freq_Hz = max(mean_freqs_Hz[imax], 0.0)
+            max_freq_spw = real_spwids[imax]
         if max_mean_freq_Hz == 0.0:
-            LOG.warning("Highest frequency spw and largest baseline cannot be determined for spwids={:s}. "
-                        "Using default uvrange.".format(','.join([str(spw) for spw in spwids])))
+            LOG.warning("Highest frequency spw and largest baseline cannot be determined for spwids=%s. "
+                        "Using default uvrange.", ','.join(map(str, spwids)))
             return None, None
         # Get max baseline
         mean_wave_m = light_speed / max_mean_freq_Hz  # in meter
-        job = casa_tasks.visstat(vis=vis, field=field, spw=str(max_freq_spw), axis='uvrange', useflags=False)
-        uv_stat = job.execute() # returns stat in meter
+        uv_stat = self._visstat(vis=vis, field=field, spw=str(max_freq_spw), axis='uvrange', useflags=False)  # returns stat in meter
         max_bl = uv_stat['DATA_DESC_ID=%s' % max_freq_spw]['max'] / mean_wave_m
 
         # Define bin for lowest 5% of baselines (in wavelength units)
@@ -127,8 +165,7 @@ class ImageParamsHeuristicsVLA(ImageParamsHeuristics):
             mean_SBL, p95_SBL = get_mean_amplitude(vis=vis, uvrange=uvrange_SBL, field=field, spw=real_spwids_str)
         except Exception as e:
             LOG.debug(e)
-            LOG.info("Data selection error   Field: {!s}, spw: {!s}.   uvrange set to >0.0klambda ".format(
-                str(field), real_spwids_str))
+            LOG.info("Data selection error   Field: %s, spw: %s.   uvrange set to >0.0klambda ", field, real_spwids_str)
             return '>0.0klambda', 1.0
 
         # Range for  50-55% bin
@@ -139,22 +176,20 @@ class ImageParamsHeuristicsVLA(ImageParamsHeuristics):
             mean_MBL, p95_MBL = get_mean_amplitude(vis=vis, uvrange=uvrange_MBL, field=field, spw=real_spwids_str)
         except Exception as e:
             LOG.debug(e)
-            LOG.info("Data selection error   Field: {!s}, spw: {!s}.   uvrange set to >0.0klambda ".format(
-                str(field), real_spwids_str))
+            LOG.info("Data selection error   Field: %s, spw: %s.   uvrange set to >0.0klambda ", field, real_spwids_str)
             return '>0.0klambda', 1.0
 
         # Compare amplitudes and decide on return value
         ratio = p95_SBL / mean_MBL
 
         # Report results
-        LOG.info('Mean amplitude in uvrange bins: {:s} is {:0.2E}Jy, '
-                 '{:s} is {:0.2E}Jy'.format(uvrange_SBL, mean_SBL, uvrange_MBL, mean_MBL))
-        LOG.info('95 percentile in uvrange bins: {:s} is {:0.2E}Jy, '
-                 '{:s} is {:0.2E}Jy'.format(uvrange_SBL, p95_SBL, uvrange_MBL, p95_MBL))
-        LOG.info('Ratio between 95 percentile small baseline bin '
-                 'and mean of middle baseline bin is {:0.2E}'.format(ratio))
+        LOG.info('Mean amplitude in uvrange bins: %s is %0.2EJy, %s is %0.2EJy',
+                 uvrange_SBL, mean_SBL, uvrange_MBL, mean_MBL)
+        LOG.info('95 percentile in uvrange bins: %s is %0.2EJy, %s is %0.2EJy',
+                 uvrange_SBL, p95_SBL, uvrange_MBL, p95_MBL)
+        LOG.info('Ratio between 95 percentile small baseline bin and mean of middle baseline bin is %0.2E', ratio)
         if ratio > 2.0:
-            LOG.info('Selecting uvrange>{:0.1f}klambda to avoid very extended emission.'.format(0.05 * max_bl / 1000.0))
+            LOG.info('Selecting uvrange>%0.1fklambda to avoid very extended emission.', 0.05 * max_bl / 1000.0)
             return ">{:0.1f}klambda".format(0.05 * max_bl / 1000.0), ratio
         else:
             # Use complete uvrange
@@ -170,11 +205,7 @@ class ImageParamsHeuristicsVLA(ImageParamsHeuristics):
             pblimit_image, pblimit_cleanmask = super().pblimits(pb, specmode=specmode)
         # used for setting CASA tclean task pblimit parameter in pipeline tclean.prepare() method
         else:
-            if specmode == 'cube':
-                pblimit_image = 0.2
-            else:
-                pblimit_image = -0.1
-            pblimit_cleanmask = 0.3
+            pblimit_image, pblimit_cleanmask = self._PBLIMITS.get(specmode, self._PBLIMITS_DEFAULT)
 
         return pblimit_image, pblimit_cleanmask
 
@@ -261,14 +292,38 @@ class ImageParamsHeuristicsVLA(ImageParamsHeuristics):
         else:
             return 'mtmfs'
 
+    def get_min_max_freq(self, spwspec):
+        """Cached version of the base class frequency limits lookup.
+
+        nterms (via get_fractional_bandwidth), gridder, wprojplanes and imsize
+        all query the same spwspec during an imaging stage.
+        """
+        if spwspec not in self._freq_limits_cache:
+            self._freq_limits_cache[spwspec] = super().get_min_max_freq(spwspec)
+        return dict(self._freq_limits_cache[spwspec])
+
+    def _percentile_baseline_length(self, percentile: float) -> float:
+        """Median over the vis list of the given baseline length percentile, in meter.
+
+        On first use all percentiles needed by the VLA heuristics are computed
+        together, with one np.percentile call per MS, and cached.
+        """
+        if percentile not in self._baseline_percentiles_cache:
+            percentiles = sorted(set(self._BASELINE_PERCENTILES) | {percentile})
+            lengths = [np.percentile(self.observing_run.get_ms(msname).antenna_array.baselines_m, percentiles)
+                       for msname in self.vislist]
+            self._baseline_percentiles_cache.update(zip(percentiles, np.median(lengths, axis=0)))
+        return self._baseline_percentiles_cache[percentile]
+
     def _get_vla_band(self, spwspec):
         """Get VLA band from spwspec, assuming spwspec from the same band."""
-        vla_band = None
-        if isinstance(spwspec, str) and spwspec != '':
+        if not isinstance(spwspec, str) or spwspec == '':
+            return None
+        if spwspec not in self._vla_band_cache:
             freq_limits = self.get_min_max_freq(spwspec)
             mean_freq_hz = (freq_limits['abs_max_freq'] + freq_limits['abs_min_freq'])/2.0
-            vla_band = find_EVLA_band(mean_freq_hz)
-        return vla_band
+            self._vla_band_cache[spwspec] = find_EVLA_band(mean_freq_hz)
+        return self._vla_band_cache[spwspec]
 
     def gridder(self, intent: str, field: str, spwspec: Optional[str] = None) -> str:
         """Determine the appropriate tclean gridder parameter for VLA.
@@ -316,7 +371,7 @@ class ImageParamsHeuristicsVLA(ImageParamsHeuristics):
         if gridder == 'wproject' and vla_band in ['L', 'S']:
 
             # calculate 75th percentile uv distance
-            uvrange_pct75_meter, _ = self.calc_percentile_baseline_length(75.)
+            uvrange_pct75_meter = self._percentile_baseline_length(75.)
             # normalized to S-band A-config
             wplanes = 384
             # scaled by 75th percentile uv distance divided by A-config value
@@ -342,7 +397,7 @@ class ImageParamsHeuristicsVLA(ImageParamsHeuristics):
         # VLA specific threshold
         # set to nsigma=4.0, rather than a hm_masking-specific nsigma value
         nsigma = 4.0
-        threshold_vla = casa_tools.quanta.quantity(nsigma * residual_robust_rms, 'Jy')
+        threshold_vla = self._qa.quantity(nsigma * residual_robust_rms, 'Jy')
 
         # Set allowed niter range
         max_niter = 1000000
@@ -382,16 +437,10 @@ class ImageParamsHeuristicsVLA(ImageParamsHeuristics):
         """Tclean nsigma parameter heuristics."""
         if hm_nsigma:
             return hm_nsigma
-        else:
-            # PIPE-678: VLA 'none' set to 5.0
-            # PIPE-677: VLA automasking set to 4.0, reduce from 5.0
-            if hm_masking == 'auto':
-                if rms_multiplier is not None:
-                    return 4.0 * rms_multiplier
-                else:
-                    return 4.0
-            else:
-                return 5.0
+        nsigma = self._NSIGMA.get(hm_masking, self._NSIGMA_DEFAULT)
+        if hm_masking == 'auto' and rms_multiplier is not None:
+            nsigma *= rms_multiplier
+        return nsigma
 
     def tclean_stopcode_ignore(self, iteration, hm_masking):
         """Tclean stop code(s) to be ignored for warning messages.
@@ -433,10 +482,7 @@ class ImageParamsHeuristicsVLA(ImageParamsHeuristics):
     def threshold(self, iteration: int, threshold: Union[str, float], hm_masking: str) -> Union[str, float]:
         """Tclean threshold parameter heuristics.
         See PIPE-678 and CASR-543"""
-        if iteration == 0 or hm_masking in ['none']:
-            return '0.0mJy'
-        else:
-            return threshold
+        return '0.0mJy' if iteration == 0 or hm_masking == 'none' else threshold
 
     def imsize(self, fields, cell, primary_beam, sfpblimit=None, max_pixels=None,
                centreonly=False, vislist=None, spwspec=None, intent: str = '', joint_intents: str = '',
@@ -510,10 +556,8 @@ class ImageParamsHeuristicsVLA(ImageParamsHeuristics):
             namer.source(field)
         if specmode != 'cont' and spwspec:
             # find all the spwids present in the list
-            p = re.compile(r"[ ,]+(\d+)")
-            spwids = p.findall(' %s' % spwspec)
-            spwids = list(set(spwids))
-            spw = '_'.join(map(str, sorted(map(int, spwids))))
+            spwids = {int(spwid) for spwid in _SPWID_PATTERN.findall(' %s' % spwspec)}
+            spw = '_'.join(map(str, sorted(spwids)))
             namer.spectral_window(spw)
         if specmode == 'cont' and band:
             namer.band('{}_band'.format(band))
@@ -556,10 +600,10 @@ class ImageParamsHeuristicsVLA(ImageParamsHeuristics):
 
         # PIPE-2311: scale continuum theoretical noise for hanning-smoothed spws.
         if specmode in ('mfs', 'cont'):
-            real_spwid = self.observing_run.virtual2real_spw_id(spw, ms_do)
+            real_spwid = self._real_spw_id(spw, ms_do)
             with casa_tools.TableReader(ms_do.name + '/SPECTRAL_WINDOW') as table:
                 if 'OFFLINE_HANNING_SMOOTH' in table.colnames():
-                    is_smoothed = table.getcol('OFFLINE_HANNING_SMOOTH')[real_spwid]
+                    is_smoothed = table.getcell('OFFLINE_HANNING_SMOOTH', int(real_spwid))
                     if is_smoothed:
                         LOG.info(
                             'EB %s spw %s has been Hanning-smoothed; multiplying apparent sensitivity return by a factor of 1.633.',
@@ -597,7 +641,7 @@ class ImageParamsHeuristicsVLA(ImageParamsHeuristics):
         if specmode in ('cube', 'repBW'):
             if all(isinstance(param, str) and 'Hz' in param for param in (start, width)) and nchan not in (None, -1):
                 try:
-                    qa = casa_tools.quanta
+                    qa = self._qa
                     start_hz = qa.convert(start, 'Hz')['value']
                     width_hz = qa.convert(width, 'Hz')['value']
                     center_freq_hz = start_hz + (nchan // 2) * width_hz
@@ -605,8 +649,8 @@ class ImageParamsHeuristicsVLA(ImageParamsHeuristics):
                     LOG.info('Use the cube center frequency as the rest frequency for VLA cube imaging: %s', rest_freq)
                 except Exception:
                     LOG.warning('Failed to derive the heuristics-based rest frequency for VLA cube imaging.')
-                    traceback_msg = traceback.format_exc()
-                    LOG.debug(traceback_msg)
+                    if LOG.isEnabledFor(logging.DEBUG):
+                        LOG.debug(traceback.format_exc())
             else:
                 LOG.warning('Cannot derive the heuristics-based rest frequency for VLA cube imaging.')
 
@@ -638,16 +682,17 @@ class ImageParamsHeuristicsVLA(ImageParamsHeuristics):
                 return nfrms_multiplier
 
         if iteration == 2 and specmode in ('cont', 'mfs') and 'TARGET' in intent:
-            image_name = imagename if os.path.exists(imagename) else imagename + \
-                '.tt0' if os.path.exists(imagename + '.tt0') else None
+            image_name = next((name for name in (imagename, imagename + '.tt0') if os.path.exists(name)), None)
 
             if image_name:
                 try:
                     with casa_tools.ImageReader(image_name) as ia:
-                        qa = casa_tools.quanta
-                        restfreq_hz = qa.convert(ia.coordsys().restfrequency(), 'Hz')['value'][0]
+                        csys = ia.coordsys()
+                    restfreq = csys.restfrequency()
+                    csys.done()
+                    restfreq_hz = self._qa.convert(restfreq, 'Hz')['value'][0]
 
-                    bl_pt5_m, _ = self.calc_percentile_baseline_length(5.)
+                    bl_pt5_m = self._percentile_baseline_length(5.)
                     c_mps = 299792458.
                     lambda_m = c_mps / restfreq_hz
 
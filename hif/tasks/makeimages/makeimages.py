@@ -1,3 +1,5 @@
+import fnmatch
+import functools
 import os
 import tempfile
 from inspect import signature
@@ -20,6 +22,9 @@ import numpy as np
 
 LOG = infrastructure.get_logger(__name__)
 
+# Keyword arguments accepted by Tclean.Inputs
+_TCLEAN_INPUTS_ARGS = frozenset(signature(Tclean.Inputs).parameters)
+
 
 class MakeImagesInputs(vdp.StandardInputs):
     # Search order of input vis
@@ -154,14 +159,30 @@ class MakeImages(basetask.StandardTaskTemplate):
         if not isinstance(inputs.vis, list):
             inputs.vis = [inputs.vis]
 
+        # representative (source, spw) per heuristics object, see _get_representative_source_spw()
+        self._repr_source_spw = {}
+
         with CleanTaskFactory(inputs, self._executor) as factory:
             task_queue = [(target, factory.get_task(target))
                           for target in inputs.target_list]
 
-            for (target, task) in task_queue:
+            # Tier-0 AsyncTasks start running on the MPI servers as soon as
+            # they are created. Execute the client-side SyncTasks first so
+            # they overlap with the AsyncTasks instead of waiting behind
+            # them, then collect the AsyncTask results. The results are
+            # still added in target list order below.
+            run_order = sorted(range(len(task_queue)),
+                               key=lambda i: isinstance(task_queue[i][1], mpihelpers.AsyncTask))
+            task_outcomes = {}
+            for i in run_order:
                 try:
-                    worker_result = task.get_result()
+                    task_outcomes[i] = (task_queue[i][1].get_result(), None)
                 except exceptions.PipelineException as ex:
+                    task_outcomes[i] = (None, ex)
+
+            for i, (target, _) in enumerate(task_queue):
+                worker_result, ex = task_outcomes.pop(i)
+                if ex is not None:
                     error_msg = ('Cleaning failure for field {!s}, intent {!s}, specmode {!s}, spw {!s}. '
                                  'Exception from hif_tclean: {!s}'.format(
                                  target['field'], target['intent'], target['specmode'], target['spw'], ex))
@@ -186,18 +207,13 @@ class MakeImages(basetask.StandardTaskTemplate):
         else:
             target_list = inputs.target_list
 
-        description = {
-            # map specmode to description for every clean target
-            _get_description_map(target['intent']).get(target['specmode'], 'Calculate clean products')
-            for target in target_list
-        }
+        # map specmode to description and sidebar suffix for every clean target
+        description = set()
+        sidebar = set()
+        for target in target_list:
+            description.add(_get_description_map(target['intent']).get(target['specmode'], 'Calculate clean products'))
+            sidebar.add(_get_sidebar_map(target['intent']).get(target['specmode'], ''))
         result.metadata['long description'] = ' / '.join(sorted(description))
-
-        sidebar = {
-            # map specmode to description for every clean target
-            _get_sidebar_map(target['intent']).get(target['specmode'], '')
-            for target in target_list
-        }
         result.metadata['sidebar suffix'] = '/'.join(sidebar)
 
         return result
@@ -222,12 +238,10 @@ class MakeImages(basetask.StandardTaskTemplate):
         beamdev_thresh = self.inputs.vlass_plane_reject_im['beamdev_thresh']
         flagpct_thresh = self.inputs.vlass_plane_reject_im['flagpct_thresh']
 
-        bmajor_list = []
-        bminor_list = []
-        bpa_list = []
-        freq_list = []
+        # per-plane bmajor, bminor, bpa, freq and flagpct of the planes with a PSF
+        plane_metrics = np.empty((5, len(result.results)), dtype=np.float64)
+        n_valid = 0
         spwgroup_list = []
-        flagpct_list = []
         ref_idx = None
         plane_keep = None
 
@@ -247,56 +261,58 @@ class MakeImages(basetask.StandardTaskTemplate):
                 ext = '.tt0' if tclean_result.multiterm else ''
                 psf_name = tclean_result.psf+ext
                 if os.path.exists(psf_name):
-                    with casa_tools.ImagepolReader(psf_name) as imagepol:
-                        img_stokesi = imagepol.stokesi()
-                        restoringbeam = img_stokesi.restoringbeam(polarization=0)
-                    imaging_metadata['beam'] = [restoringbeam['major']['value'],
-                                                restoringbeam['minor']['value'],
-                                                restoringbeam['positionangle']['value']]
+                    imaging_metadata['beam'] = list(_read_psf_beam(psf_name))
                     imaging_metadata['keep'] = True
-                    bmajor_list.append(imaging_metadata['beam'][0])
-                    bminor_list.append(imaging_metadata['beam'][1])
-                    bpa_list.append(imaging_metadata['beam'][2])
-                    freq_list.append(imaging_metadata['freq'])
+                    plane_metrics[:, n_valid] = np.array(
+                        imaging_metadata['beam'] + [imaging_metadata['freq'], imaging_metadata['flagpct']],
+                        dtype=np.float64)
+                    n_valid += 1
                     spwgroup_list.append(imaging_metadata['spw'])
-                    flagpct_list.append(imaging_metadata['flagpct'])
             tclean_result.imaging_metadata = imaging_metadata
 
         # update tclean_result.imaging_metadata['keep'] based on the beam size and flagging percentage
-        if bminor_list:
-            ref_idx = np.argsort(bminor_list)[len(bminor_list)//2]
-
-            bmajor_expected = bmajor_list[ref_idx]*freq_list[ref_idx]/np.array(freq_list)
-            bminor_expected = bminor_list[ref_idx]*freq_list[ref_idx]/np.array(freq_list)
-            c1 = (bmajor_expected*(1.-beamdev_thresh) < np.array(bmajor_list))
-            c2 = (bmajor_expected*(1.+beamdev_thresh) > np.array(bmajor_list))
-            c3 = (bminor_expected*(1.-beamdev_thresh) < np.array(bminor_list))
-            c4 = (bminor_expected*(1.+beamdev_thresh) > np.array(bminor_list))
-            c5 = (np.array(flagpct_list) < flagpct_thresh)
-
-            spwgroup_keep = [False]*len(spwgroup_list)
-            for idx, spwgroup in enumerate(spwgroup_list):
-                is_spwgroup_excluded = set(map(str.strip, spwgroup.split(','))) & set(
-                    map(str.strip, self.inputs.vlass_plane_reject_im['exclude_spw'].split(',')))
-                if is_spwgroup_excluded or not self.inputs.vlass_plane_reject_im['apply']:
-                    spwgroup_keep[idx] = True
-
-            plane_keep = c1 & c2 & c3 & c4 & c5 | np.array(spwgroup_keep)
+        bmajor_arr, bminor_arr, bpa_arr, freq_arr, flagpct_arr = plane_metrics[:, :n_valid]
+        if n_valid > 0:
+            ref_idx = np.argpartition(bminor_arr, n_valid//2)[n_valid//2]
+
+            if self.inputs.vlass_plane_reject_im['apply']:
+                # expected beam sizes scale inversely with frequency from the reference plane
+                freq_ratio = freq_arr[ref_idx]/freq_arr
+                bmajor_expected = bmajor_arr[ref_idx]*freq_ratio
+                bminor_expected = bminor_arr[ref_idx]*freq_ratio
+                beam_and_flag_ok = np.logical_and.reduce([
+                    bmajor_expected*(1.-beamdev_thresh) < bmajor_arr,
+                    bmajor_expected*(1.+beamdev_thresh) > bmajor_arr,
+                    bminor_expected*(1.-beamdev_thresh) < bminor_arr,
+                    bminor_expected*(1.+beamdev_thresh) > bminor_arr,
+                    flagpct_arr < flagpct_thresh])
+
+                exclude_spw = frozenset(
+                    spw.strip() for spw in self.inputs.vlass_plane_reject_im['exclude_spw'].split(',') if spw.strip())
+                spwgroup_keep = [not exclude_spw.isdisjoint(map(str.strip, spwgroup.split(',')))
+                                 for spwgroup in spwgroup_list]
+
+                plane_keep = beam_and_flag_ok | np.array(spwgroup_keep)
+            else:
+                # plane rejection is switched off: keep every plane with a PSF
+                plane_keep = np.ones(n_valid, dtype=bool)
             # create a lookup dict for the plane rejection info
             plane_keep_dict = {spwgroup: plane_keep[idx] for idx, spwgroup in enumerate(spwgroup_list)}
+            # all planes are imaged into the same directory; list it once for all of them
+            dir_listing = {}
             for idx, tclean_result in enumerate(result.results):
                 target_spw = result.targets[idx]['spw']
                 if target_spw in plane_keep_dict:
                     tclean_result.imaging_metadata['keep'] = plane_keep_dict[target_spw]
-                self._vlass_cube_set_miscinfo(tclean_result)
+                self._vlass_cube_set_miscinfo(tclean_result, dir_listing)
 
         # attched the metadata w.r.t the plane rejection for the plane rejection plot.
-        result.metadata['vlass_cube_metadata'] = {'bmajor_list': np.array(bmajor_list),
-                                                  'bminor_list': np.array(bminor_list),
-                                                  'bpa_list': np.array(bpa_list),
-                                                  'freq_list': np.array(freq_list),
+        result.metadata['vlass_cube_metadata'] = {'bmajor_list': bmajor_arr,
+                                                  'bminor_list': bminor_arr,
+                                                  'bpa_list': bpa_arr,
+                                                  'freq_list': freq_arr,
                                                   'spwgroup_list': spwgroup_list,
-                                                  'flagpct_list': np.array(flagpct_list),
+                                                  'flagpct_list': flagpct_arr,
                                                   'beam_dev': beamdev_thresh,
                                                   'ref_idx': ref_idx,
                                                   'flagpct_threshold': flagpct_thresh,
@@ -304,12 +320,22 @@ class MakeImages(basetask.StandardTaskTemplate):
 
         return result
 
-    def _vlass_cube_set_miscinfo(self, tclean_result):
-        """Add the VLASS cube plane rejection header keyword."""
+    def _vlass_cube_set_miscinfo(self, tclean_result, dir_listing=None):
+        """Add the VLASS cube plane rejection header keyword.
+
+        dir_listing is an optional dict of directory name to directory
+        contents, shared between calls so each directory is read only once.
+        """
 
         imagename = tclean_result.image
         reject = not tclean_result.imaging_metadata['keep']
-        imlist = utils.glob_ordered(imagename.replace('.image', '.*'))
+        if dir_listing is None:
+            imlist = utils.glob_ordered(imagename.replace('.image', '.*'))
+        else:
+            dirname, name_pattern = os.path.split(imagename.replace('.image', '.*'))
+            if dirname not in dir_listing:
+                dir_listing[dirname] = os.listdir(dirname or os.curdir)
+            imlist = sorted(os.path.join(dirname, name) for name in fnmatch.filter(dir_listing[dirname], name_pattern))
         for name in imlist:
             with casa_tools.ImageReader(name) as image:
                 info = image.miscinfo()
@@ -336,13 +362,24 @@ class MakeImages(basetask.StandardTaskTemplate):
             return clean_result.intent == 'TARGET'
 
         # Representative source and SpW
-        _, repr_source, repr_spw, _, _, _, _, _, _, _ = heuristics.representative_target()
+        repr_source, repr_spw = self._get_representative_source_spw(heuristics)
         if str(repr_spw) in clean_result.spw.split(',') and repr_source == utils.dequote(clean_result.sourcename):
             return True
 
         # Don't export image sensitivity for the other clean targets
         return False
 
+    def _get_representative_source_spw(self, heuristics):
+        """
+        Returns the representative source and spw of the given imaging heuristics.
+        The result is kept per heuristics object, so representative_target() is
+        evaluated only once per MakeImages run even if asked for several times.
+        """
+        if heuristics not in self._repr_source_spw:
+            _, repr_source, repr_spw, _, _, _, _, _, _, _ = heuristics.representative_target()
+            self._repr_source_spw[heuristics] = (repr_source, repr_spw)
+        return self._repr_source_spw[heuristics]
+
     def _get_image_rms_as_sensitivity(self, result, target, heuristics):
         if not result.image:
             return None
@@ -376,7 +413,7 @@ class MakeImages(basetask.StandardTaskTemplate):
         array = ('%dm' % min(diameters))
 
         # Check if this sensitivity is for the representative source and SpW
-        _, repr_source, repr_spw, _, _, _, _, _, _, _ = heuristics.representative_target()
+        repr_source, repr_spw = self._get_representative_source_spw(heuristics)
         if str(repr_spw) in result.spw.split(',') and repr_source == utils.dequote(result.sourcename):
             is_representative = True
         else:
@@ -401,6 +438,17 @@ class MakeImages(basetask.StandardTaskTemplate):
                            datatype=result.datatype)
 
 
+def _read_psf_beam(psf_name):
+    """Return the Stokes I restoring beam (major, minor, positionangle) values of a PSF image."""
+    with casa_tools.ImagepolReader(psf_name) as imagepol:
+        img_stokesi = imagepol.stokesi()
+        restoringbeam = img_stokesi.restoringbeam(polarization=0)
+        img_stokesi.done()
+    return (restoringbeam['major']['value'],
+            restoringbeam['minor']['value'],
+            restoringbeam['positionangle']['value'])
+
+
 class CleanTaskFactory(object):
     def __init__(self, inputs, executor):
         self.__inputs = inputs
@@ -468,8 +516,7 @@ class CleanTaskFactory(object):
         # we check/remove the task_arg dictionary keys that are not required by Tclean.Inputs
         # then clean_targets objects would be free to carry extra metedata without causing problems during
         # hif_tclean task execuation.
-        task_inputs_args = list(signature(Tclean.Inputs).parameters)
-        task_args = {k: v for k, v in task_args.items() if k in task_inputs_args}
+        task_args = {k: v for k, v in task_args.items() if k in _TCLEAN_INPUTS_ARGS}
 
         if is_tier0_job and parallel_wanted:
             executable = mpihelpers.Tier0PipelineTask(Tclean,
@@ -593,6 +640,7 @@ class CleanTaskFactory(object):
         return task_args
 
 
+@functools.lru_cache(maxsize=None)
 def _get_description_map(intent):
     if intent in ('PHASE', 'BANDPASS', 'AMPLITUDE'):
         return {
@@ -626,6 +674,7 @@ def _get_description_map(intent):
         return {}
 
 
+@functools.lru_cache(maxsize=None)
 def _get_sidebar_map(intent):
     if intent in ('PHASE', 'BANDPASS', 'AMPLITUDE', 'DIFFGAINREF', 'DIFFGAINSRC'):
         return {
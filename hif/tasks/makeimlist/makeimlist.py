@@ -1,6 +1,9 @@
+import collections
 import copy
+import functools
 import operator
 import os
+from typing import Optional
 
 import pipeline.domain.measures as measures
 import pipeline.infrastructure as infrastructure
@@ -18,6 +21,15 @@ from .resultobjects import MakeImListResult
 
 LOG = infrastructure.get_logger(__name__)
 
+# Allowed values of the specmode task parameter
+_VALID_SPECMODES = frozenset({'mfs', 'cont', 'cube', 'repBW'})
+# Allowed (upper case) values of the datacolumn task parameter
+_VALID_DATACOLUMNS = frozenset({'DATA', 'CORRECTED'})
+# DataType members by name
+_DATATYPE_BY_NAME = {v.name: v for v in DataType}
+# vis task parameter values meaning "no explicit vis list" (a list is unhashable, hence a tuple)
+_UNSET_VIS = (None, '', [''])
+
 
 class MakeImListInputs(vdp.StandardInputs):
     # Must use empty data type list to allow for user override and
@@ -56,13 +68,14 @@ class MakeImListInputs(vdp.StandardInputs):
 
     @vdp.VisDependentProperty
     def field(self):
-        if 'TARGET' in self.intent and 'field' in self.context.size_mitigation_parameters:
-            return self.context.size_mitigation_parameters['field']
+        smp = self.context.size_mitigation_parameters
+        if 'TARGET' in self.intent and 'field' in smp:
+            return smp['field']
         return ''
 
     @field.convert
     def field(self, val):
-        if not isinstance(val, (str, type(None))):
+        if val is not None and not isinstance(val, str):
             # PIPE-1881: allow field names that mistakenly get casted into non-string datatype by
             # recipereducer (utils.string_to_val) and executeppr (XmlObjectifier.castType)
             LOG.warning('The field selection input %r is not a string and will be converted.', val)
@@ -75,11 +88,11 @@ class MakeImListInputs(vdp.StandardInputs):
 
     @hm_cell.convert
     def hm_cell(self, val):
-        if not isinstance(val, str) and not isinstance(val, list):
-            raise ValueError('Malformatted value for hm_cell: {!r}'.format(val))
-
         if isinstance(val, str):
-            val = [val]
+            return val if 'ppb' in val else [val]
+
+        if not isinstance(val, list):
+            raise ValueError('Malformatted value for hm_cell: {!r}'.format(val))
 
         for item in val:
             if isinstance(item, str):
@@ -94,14 +107,14 @@ class MakeImListInputs(vdp.StandardInputs):
 
     @hm_imsize.convert
     def hm_imsize(self, val):
-        if not isinstance(val, int) and not isinstance(val, str) and not isinstance(val, list):
-            raise ValueError('Malformatted value for hm_imsize: {!r}'.format(val))
-
         if isinstance(val, int):
             return [val, val]
 
         if isinstance(val, str):
-            val = [val]
+            return val if 'pb' in val else [val]
+
+        if not isinstance(val, list):
+            raise ValueError('Malformatted value for hm_imsize: {!r}'.format(val))
 
         for item in val:
             if isinstance(item, str):
@@ -118,14 +131,16 @@ class MakeImListInputs(vdp.StandardInputs):
 
     @vdp.VisDependentProperty
     def nbins(self):
-        if 'TARGET' in self.intent and 'nbins' in self.context.size_mitigation_parameters:
-            return self.context.size_mitigation_parameters['nbins']
+        smp = self.context.size_mitigation_parameters
+        if 'TARGET' in self.intent and 'nbins' in smp:
+            return smp['nbins']
         return ''
 
     @vdp.VisDependentProperty
     def spw(self):
-        if 'TARGET' in self.intent and 'spw' in self.context.size_mitigation_parameters and self.specmode=='cube':
-            return self.context.size_mitigation_parameters['spw']
+        smp = self.context.size_mitigation_parameters
+        if 'TARGET' in self.intent and 'spw' in smp and self.specmode=='cube':
+            return smp['spw']
         return ''
 
     @spw.convert
@@ -152,14 +167,14 @@ class MakeImListInputs(vdp.StandardInputs):
 
         TODO: refactor and make hif_checkproductsize() (or a new task) spwlist aware."""
 
+        smp = self.context.size_mitigation_parameters
         mitigated_hm_cell = None
-        if 'TARGET' in self.intent and 'hm_cell' in self.context.size_mitigation_parameters:
-            mitigated_hm_cell = self.context.size_mitigation_parameters['hm_cell']
+        if 'TARGET' in self.intent and 'hm_cell' in smp:
+            mitigated_hm_cell = smp['hm_cell']
 
-        multi_target_size_mitigation = self.context.size_mitigation_parameters.get('multi_target_size_mitigation', {})
+        multi_target_size_mitigation = smp.get('multi_target_size_mitigation', {})
         if multi_target_size_mitigation:
-            multi_target_spwlist = [spws for spws in multi_target_size_mitigation.keys() if set(
-                spwlist.split(',')).issubset(set(spws.split(',')))]
+            multi_target_spwlist = _containing_spwlists(spwlist, multi_target_size_mitigation)
             if len(multi_target_spwlist) == 1:
                 mitigated_hm_cell = multi_target_size_mitigation.get(multi_target_spwlist[0], {}).get('hm_cell')
 
@@ -172,13 +187,13 @@ class MakeImListInputs(vdp.StandardInputs):
         """If possible obtain spwlist specific hm_imsize, otherwise return generic value.
 
         TODO: refactor and make hif_checkproductsize() (or a new task) spwlist aware."""
+        smp = self.context.size_mitigation_parameters
         mitigated_hm_imsize = None
-        if 'TARGET' in self.intent and 'hm_imsize' in self.context.size_mitigation_parameters:
-            mitigated_hm_imsize = self.context.size_mitigation_parameters['hm_imsize']
-        multi_target_size_mitigation = self.context.size_mitigation_parameters.get('multi_target_size_mitigation', {})
+        if 'TARGET' in self.intent and 'hm_imsize' in smp:
+            mitigated_hm_imsize = smp['hm_imsize']
+        multi_target_size_mitigation = smp.get('multi_target_size_mitigation', {})
         if multi_target_size_mitigation:
-            multi_target_spwlist = [spws for spws in multi_target_size_mitigation.keys() if set(
-                spwlist.split(',')).issubset(set(spws.split(',')))]
+            multi_target_spwlist = _containing_spwlists(spwlist, multi_target_size_mitigation)
             if len(multi_target_spwlist) == 1:
                 mitigated_hm_imsize = multi_target_size_mitigation.get(multi_target_spwlist[0], {}).get('hm_imsize')
         if mitigated_hm_imsize in [None, {}] or self.hm_imsize:
@@ -227,6 +242,108 @@ class MakeImListInputs(vdp.StandardInputs):
         self.scal = scal
 
 
+@functools.lru_cache(maxsize=None)
+def _spw_set(spwlist: str) -> frozenset:
+    """Return the set of spw IDs in a comma separated spw list string."""
+    return frozenset(spwlist.split(','))
+
+
+def _containing_spwlists(spwlist: str, spwlists) -> list:
+    """Return the spw list strings among spwlists that contain all spws of spwlist."""
+    spw_set = _spw_set(spwlist)
+    return [spws for spws in spwlists if spw_set.issubset(_spw_set(spws))]
+
+
+def _parse_nbins(nbins: str) -> dict:
+    """Parse an nbins string of the form 'spw:nbin,...' ('*' for all spws) into {spw: nbin}."""
+    nbins_dict = {}
+    for nbin_item in nbins.split(','):
+        key, value = nbin_item.split(':', 1)
+        nbins_dict[key] = int(value)
+    return nbins_dict
+
+
+def _user_datatypes_error(user_datatypes_str) -> Optional[str]:
+    """Return the error message for an invalid list of user data type strings, or None if it is valid.
+
+    "REGCAL"/"SELFCAL" are expanded to explicit data types later and thus
+    must not be combined with explicit data types. Otherwise all given
+    names must be known DataType names.
+    """
+    if 'REGCAL' in user_datatypes_str or 'SELFCAL' in user_datatypes_str:
+        if not _DATATYPE_BY_NAME.keys().isdisjoint(user_datatypes_str):
+            return '"REGCAL"/"SELFCAL" and explicit data types are mutually exclusive'
+        return None
+
+    undefined_datatypes_str = [d for d in user_datatypes_str if d not in _DATATYPE_BY_NAME]
+    if undefined_datatypes_str:
+        return 'Undefined data type(s): {}'.format(','.join(undefined_datatypes_str))
+    return None
+
+
+def _split_selfcal_regcal(datatypes_str) -> tuple:
+    """Split data type strings into (SELFCAL, REGCAL) lists, keeping their order."""
+    selfcal_datatypes_str, regcal_datatypes_str = [], []
+    for datatype_str in datatypes_str:
+        if 'SELFCAL' in datatype_str:
+            selfcal_datatypes_str.append(datatype_str)
+        elif 'REGCAL' in datatype_str:
+            regcal_datatypes_str.append(datatype_str)
+    return selfcal_datatypes_str, regcal_datatypes_str
+
+
+class _DomainLookupCache(object):
+    """Memoize observing run / MS domain lookups repeated across the imaging target loops.
+
+    The domain objects are not modified while the imaging target list is
+    prepared, so each lookup only needs to be made once per prepare() call.
+    """
+
+    def __init__(self, observing_run):
+        self._observing_run = observing_run
+        # vis -> MeasurementSet
+        self._ms = {}
+        # (vis, task_arg, name, intent) -> list of Field
+        self._fields = {}
+        # (real spw ID, vis) -> virtual spw ID
+        self._r2v = {}
+        # (virtual spw ID, vis) -> real spw ID
+        self._v2r = {}
+        # (virtual spw ID, vis) -> spw centre frequency in Hz
+        self._centre_freq = {}
+
+    def get_ms(self, vis):
+        if vis not in self._ms:
+            self._ms[vis] = self._observing_run.get_ms(vis)
+        return self._ms[vis]
+
+    def get_fields(self, vis, task_arg=None, name=None, intent=None):
+        key = (vis, task_arg, name, intent)
+        if key not in self._fields:
+            self._fields[key] = self.get_ms(vis).get_fields(task_arg, name=name, intent=intent)
+        return self._fields[key]
+
+    def real2virtual_spw_id(self, spwid, vis):
+        key = (int(spwid), vis)
+        if key not in self._r2v:
+            self._r2v[key] = self._observing_run.real2virtual_spw_id(spwid, self.get_ms(vis))
+        return self._r2v[key]
+
+    def virtual2real_spw_id(self, spwid, vis):
+        key = (int(spwid), vis)
+        if key not in self._v2r:
+            self._v2r[key] = self._observing_run.virtual2real_spw_id(spwid, self.get_ms(vis))
+        return self._v2r[key]
+
+    def centre_frequency_hz(self, spwid, vis):
+        key = (int(spwid), vis)
+        if key not in self._centre_freq:
+            real_spwid = self.virtual2real_spw_id(spwid, vis)
+            spw = self.get_ms(vis).get_spectral_window(real_spwid)
+            self._centre_freq[key] = spw.centre_frequency.to_units(measures.FrequencyUnits.HERTZ)
+        return self._centre_freq[key]
+
+
 @task_registry.set_equivalent_casa_task('hif_makeimlist')
 @task_registry.set_casa_commands_comment('A list of target sources to be imaged is constructed.')
 class MakeImList(basetask.StandardTaskTemplate):
@@ -245,6 +362,7 @@ class MakeImList(basetask.StandardTaskTemplate):
         else:
             known_synthesized_beams = inputs.context.synthesized_beams
         qaTool = casa_tools.quanta
+        domain_lookup = _DomainLookupCache(inputs.context.observing_run)
 
         imaging_mode = inputs.context.project_summary.telescope
 
@@ -259,10 +377,14 @@ class MakeImList(basetask.StandardTaskTemplate):
 
         # describe the function of this task by interpreting the inputs
         # parameters to give an execution context
-        long_descriptions = [_DESCRIPTIONS.get((intent.strip(), inputs.specmode), inputs.specmode) for intent in inputs.intent.split(',')]
+        intents = tuple(intent.strip() for intent in inputs.intent.split(','))
+        long_descriptions = []
+        sidebar_suffixes = set()
+        for intent in intents:
+            key = (intent, inputs.specmode)
+            long_descriptions.append(_DESCRIPTIONS.get(key, inputs.specmode))
+            sidebar_suffixes.add(_SIDEBAR_SUFFIX.get(key, inputs.specmode))
         result.metadata['long description'] = 'Set-up parameters for %s imaging' % ' & '.join(utils.deduplicate(long_descriptions))
-
-        sidebar_suffixes = {_SIDEBAR_SUFFIX.get((intent.strip(), inputs.specmode), inputs.specmode) for intent in inputs.intent.split(',')}
         result.metadata['sidebar suffix'] = '/'.join(sidebar_suffixes)
 
         # Check if this stage has been disabled for vla (never set for ALMA)
@@ -286,7 +408,7 @@ class MakeImList(basetask.StandardTaskTemplate):
                 return result
 
         # validate vis
-        if inputs.vis not in (None, '', ['']) and not isinstance(inputs.vis, list):
+        if inputs.vis not in _UNSET_VIS and not isinstance(inputs.vis, list):
             msg = '"vis" must be a list of strings'
             LOG.error(msg)
             result.error = True
@@ -294,7 +416,7 @@ class MakeImList(basetask.StandardTaskTemplate):
             return result
 
         # validate specmode
-        if inputs.specmode not in ('mfs', 'cont', 'cube', 'repBW'):
+        if inputs.specmode not in _VALID_SPECMODES:
             msg = '"specmode" must be one of "mfs", "cont", "cube", or "repBW"'
             LOG.error(msg)
             result.error = True
@@ -310,7 +432,8 @@ class MakeImList(basetask.StandardTaskTemplate):
             return result
 
         # validate datacolumn
-        if inputs.datacolumn.upper() not in (None, '', 'DATA', 'CORRECTED'):
+        datacolumn_upper = inputs.datacolumn.upper() if inputs.datacolumn else ''
+        if datacolumn_upper and datacolumn_upper not in _VALID_DATACOLUMNS:
             msg = '"datacolumn" must be "data" or "corrected"'
             LOG.error(msg)
             result.error = True
@@ -327,7 +450,7 @@ class MakeImList(basetask.StandardTaskTemplate):
 
         # Check against any user input for datatype to make sure that the
         # correct initial vis list is chosen (e.g. for REGCAL_CONTLINE_ALL and RAW).
-        known_datatypes_str = [v.name for v in DataType]
+        known_datatypes_str = _DATATYPE_BY_NAME.keys()
         explicit_user_datatypes = False
         if inputs.datatype not in (None, ''):
             # Consider every comma separated user value just once
@@ -342,7 +465,7 @@ class MakeImList(basetask.StandardTaskTemplate):
                     return result
                 explicit_user_datatypes = True
                 # Use only intersection of specmode and user data types
-                specmode_datatypes = list(set(specmode_datatypes).intersection(set(DataType[datatype_str] for datatype_str in user_datatypes_str)))
+                specmode_datatypes = list(set(specmode_datatypes).intersection(set(_DATATYPE_BY_NAME[datatype_str] for datatype_str in user_datatypes_str)))
         else:
             user_datatypes_str = []
 
@@ -375,10 +498,10 @@ class MakeImList(basetask.StandardTaskTemplate):
         # appendices.
 
         # Select the correct vis list
-        if inputs.vis in (None, '', ['']):
-            (ms_objects_and_columns, selected_datatype) = inputs.context.observing_run.get_measurement_sets_of_type(dtypes=specmode_datatypes, msonly=False)
-        else:
-            (ms_objects_and_columns, selected_datatype) = inputs.context.observing_run.get_measurement_sets_of_type(dtypes=specmode_datatypes, msonly=False, vis=inputs.vis)
+        ms_query_kwargs = {'msonly': False}
+        if inputs.vis not in _UNSET_VIS:
+            ms_query_kwargs['vis'] = inputs.vis
+        (ms_objects_and_columns, selected_datatype) = inputs.context.observing_run.get_measurement_sets_of_type(dtypes=specmode_datatypes, **ms_query_kwargs)
 
         if not ms_objects_and_columns:
             result.set_info({'msg': 'No data found. No imaging targets were created.',
@@ -390,12 +513,14 @@ class MakeImList(basetask.StandardTaskTemplate):
 
         # Check for changing vis lists.
         if explicit_user_datatypes:
+            ms_objects = frozenset(ms_objects_and_columns)
             for user_datatype_str in user_datatypes_str:
-                if inputs.vis in (None, '', ['']):
-                    (sub_ms_objects_and_columns, sub_selected_datatype) = inputs.context.observing_run.get_measurement_sets_of_type(dtypes=[DataType[user_datatype_str]], msonly=False)
-                else:
-                    (sub_ms_objects_and_columns, sub_selected_datatype) = inputs.context.observing_run.get_measurement_sets_of_type(dtypes=[DataType[user_datatype_str]], msonly=False, vis=inputs.vis)
-                if set(ms_objects_and_columns) != set(sub_ms_objects_and_columns):
+                user_datatype = _DATATYPE_BY_NAME[user_datatype_str]
+                if specmode_datatypes == [user_datatype]:
+                    # same query as for the reference vis list above
+                    continue
+                (sub_ms_objects_and_columns, sub_selected_datatype) = inputs.context.observing_run.get_measurement_sets_of_type(dtypes=[user_datatype], **ms_query_kwargs)
+                if ms_objects != frozenset(sub_ms_objects_and_columns):
                     msg = 'Requested data types and specmode lead to multiple vis lists. Please run hif_makeimlist with data type selections per kind of MS (targets, targets_line, etc.).'
                     LOG.error(msg)
                     result.error = True
@@ -409,7 +534,7 @@ class MakeImList(basetask.StandardTaskTemplate):
         selected_datatypes_info = [global_datatype_info]
         automatic_datatype_choice = True
 
-        global_columns = list(ms_objects_and_columns.values())
+        first_ms_object, first_column = next(iter(ms_objects_and_columns.items()))
 
         if inputs.datatype in (None, '') and inputs.datacolumn in (None, ''):
             # Log these messages only if there is no user data type
@@ -418,36 +543,36 @@ class MakeImList(basetask.StandardTaskTemplate):
             if selected_datatype == DataType.RAW:
                 LOG.warn('Falling back to raw data for imaging.')
 
-            if not all(global_column == global_columns[0] for global_column in global_columns):
+            if any(column != first_column for column in ms_objects_and_columns.values()):
                 LOG.warn(f'Data type based column selection changes among MSes: {",".join(f"{k.basename}: {v}" for k,v in ms_objects_and_columns.items())}.')
 
-        if inputs.datacolumn not in (None, ''):
-            ms_datacolumn = inputs.datacolumn.upper()
+        if datacolumn_upper:
+            ms_datacolumn = datacolumn_upper
             # Handle difference in MS and tclean column naming schemes
             if ms_datacolumn == 'CORRECTED':
                 ms_datacolumn = 'CORRECTED_DATA'
-            ms_object = list(ms_objects_and_columns)[0]
+            ms_object = first_ms_object
             if ms_datacolumn not in ms_object.data_colnames():
                 msg = f'Data column {inputs.datacolumn} not available.'
                 LOG.error(msg)
                 result.error = True
                 result.error_msg = msg
                 return result
-            global_datacolumn = inputs.datacolumn.upper()
+            global_datacolumn = datacolumn_upper
             global_datatype = ms_object.get_data_type(ms_datacolumn)
             global_datatype_str = global_datatype.name
             global_datatype_info = f'{global_datatype_str} instead of {selected_datatype.name} due to user datacolumn'
             selected_datatypes_str = [global_datatype_str]
             selected_datatypes_info = [global_datatype_info]
             automatic_datatype_choice = False
-            LOG.info(f'Manual override of datacolumn to {global_datacolumn}. Automatic data type ({selected_datatype.name}) based datacolumn would have been "{"DATA" if global_columns[0] == "DATA" else "CORRECTED"}". Data type of {global_datacolumn} column is {global_datatype_str}.')
+            LOG.info(f'Manual override of datacolumn to {global_datacolumn}. Automatic data type ({selected_datatype.name}) based datacolumn would have been "{"DATA" if first_column == "DATA" else "CORRECTED"}". Data type of {global_datacolumn} column is {global_datatype_str}.')
         else:
-            if global_columns[0] == 'DATA':
+            if first_column == 'DATA':
                 global_datacolumn = 'data'
-            elif global_columns[0] == 'CORRECTED_DATA':
+            elif first_column == 'CORRECTED_DATA':
                 global_datacolumn = 'corrected'
             else:
-                LOG.warn(f'Unknown column name {global_columns[0]}')
+                LOG.warn(f'Unknown column name {first_column}')
                 global_datacolumn = ''
 
         datacolumn = global_datacolumn
@@ -455,14 +580,14 @@ class MakeImList(basetask.StandardTaskTemplate):
 
         # Handle user supplied data type requests
         if inputs.datatype not in (None, ''):
-            # Extract all available data types for the vis list
-            vislist_datatypes_str = []
-            for vis in inputs.vis:
-                ms_object = inputs.context.observing_run.get_ms(vis)
-                # Collect the data types across the vis list
-                vislist_datatypes_str = vislist_datatypes_str + [ms_datatype.name for ms_datatype in ms_object.data_column]
-            # Use just a set
-            vislist_datatypes_str = list(set(vislist_datatypes_str))
+            # Extract all available data types across the vis list
+            # Reuse the MS objects already selected above and only fall back
+            # to the (linear) observing run lookup for any others.
+            ms_by_name = {name: ms for ms in ms_objects_and_columns for name in (ms.name, ms.basename)}
+            get_ms = inputs.context.observing_run.get_ms
+            vislist_datatypes_str = {ms_datatype.name
+                                     for vis in inputs.vis
+                                     for ms_datatype in (ms_by_name[vis] if vis in ms_by_name else get_ms(vis)).data_column}
             # Intersection of specmode based and vis based datatypes gives
             # list of actually available data types for this call.
             available_datatypes_str = list(set(specmode_datatypes_str).intersection(vislist_datatypes_str))
@@ -490,41 +615,34 @@ class MakeImList(basetask.StandardTaskTemplate):
 
                 # All SELFCAL and REGCAL choices available for this vis list
                 # List selfcal first, then regcal
-                user_datatypes_str = [datatype_str for datatype_str in available_datatypes_str if 'SELFCAL' in datatype_str]
-                user_datatypes_str = user_datatypes_str + [datatype_str for datatype_str in available_datatypes_str if 'REGCAL' in datatype_str]
-                user_datatypes_info = [datatype_str for datatype_str in user_datatypes_str]
+                selfcal_datatypes_str, regcal_datatypes_str = _split_selfcal_regcal(available_datatypes_str)
+                user_datatypes_str = selfcal_datatypes_str + regcal_datatypes_str
+                user_datatypes_info = user_datatypes_str
                 automatic_datatype_choice = False
             else:
                 user_datatypes_str = [datatype_str.strip().upper() for datatype_str in inputs.datatype.split(',')]
-                if 'REGCAL' in user_datatypes_str or 'SELFCAL' in user_datatypes_str:
-                    # Check if any explicit data types are given
-                    if any(datatype_str in specmode_datatypes for datatype_str in user_datatypes_str):
-                        msg = '"REGCAL"/"SELFCAL" and explicit data types are mutually exclusive'
-                        LOG.error(msg)
-                        result.error = True
-                        result.error_msg = msg
-                        return result
+                msg = _user_datatypes_error(user_datatypes_str)
+                if msg is not None:
+                    LOG.error(msg)
+                    result.error = True
+                    result.error_msg = msg
+                    return result
 
+                if 'REGCAL' in user_datatypes_str or 'SELFCAL' in user_datatypes_str:
                     # Expand SELFCAL and REGCAL to explicit data types for this vis list
+                    selfcal_datatypes_str, regcal_datatypes_str = _split_selfcal_regcal(available_datatypes_str)
                     expanded_user_datatypes_str = []
                     # List selfcal first, then regcal
                     if 'SELFCAL' in user_datatypes_str:
-                        expanded_user_datatypes_str = expanded_user_datatypes_str + [datatype_str for datatype_str in available_datatypes_str if 'SELFCAL' in datatype_str]
+                        expanded_user_datatypes_str.extend(selfcal_datatypes_str)
                     if 'REGCAL' in user_datatypes_str:
-                        expanded_user_datatypes_str = expanded_user_datatypes_str + [datatype_str for datatype_str in available_datatypes_str if 'REGCAL' in datatype_str]
+                        expanded_user_datatypes_str.extend(regcal_datatypes_str)
                     user_datatypes_str = expanded_user_datatypes_str
                     automatic_datatype_choice = False
                 else:
                     # Explicit individual data types
-                    datatype_checklist = [datatype_str not in known_datatypes_str for datatype_str in user_datatypes_str]
-                    if any(datatype_checklist):
-                        msg = 'Undefined data type(s): {}'.format(','.join(d for d, c in zip(user_datatypes_str, datatype_checklist) if c))
-                        LOG.error(msg)
-                        result.error = True
-                        result.error_msg = msg
-                        return result
                     automatic_datatype_choice = False
-                user_datatypes_info = [datatype_str for datatype_str in user_datatypes_str]
+                user_datatypes_info = user_datatypes_str
 
             selected_datatypes_str = user_datatypes_str
             selected_datatypes_info = user_datatypes_info
@@ -585,11 +703,7 @@ class MakeImList(basetask.StandardTaskTemplate):
             else:
                 repr_spw_nbin = 1
                 if inputs.context.size_mitigation_parameters.get('nbins', '') != '':
-                    nbin_items = inputs.nbins.split(',')
-                    for nbin_item in nbin_items:
-                        key, value = nbin_item.split(':')
-                        if key == str(repr_spw):
-                            repr_spw_nbin = int(value)
+                    repr_spw_nbin = _parse_nbins(inputs.nbins).get(str(repr_spw), repr_spw_nbin)
 
                 # The PI cube shall only be created if the PI bandwidth is greater
                 # than 4 times the nbin averaged bandwidth used in the default cube
@@ -622,6 +736,11 @@ class MakeImList(basetask.StandardTaskTemplate):
             repr_target_mode = False
             image_repr_target = False
 
+        # Channel binning factors per spw ('*' for all spws), parsed once for all imaging targets
+        nbins_dict = {}
+        if inputs.nbins != '' and inputs.specmode != 'cont':
+            nbins_dict = _parse_nbins(inputs.nbins)
+
         if (not repr_target_mode) or (repr_target_mode and image_repr_target):
             # read the spw, if none then set default
             spw = inputs.spw
@@ -724,32 +843,39 @@ class MakeImList(basetask.StandardTaskTemplate):
                     else:
                         spwids = spwlist_local
 
+                    # Get the real science spw IDs and the field names per MS
+                    # TODO: This is missing spws that got removed in hif_uvcontsub.
+                    #       Need to involve the full spwlist from above.
+                    ms_science_spwids_by_vis = {}
+                    field_names_by_vis = {}
+                    for vis in vislist:
+                        ms_domain_obj = domain_lookup.get_ms(vis)
+                        ms_science_spwids_by_vis[vis] = {s.id for s in ms_domain_obj.get_spectral_windows()}
+                        field_names_by_vis[vis] = {f.name for f in ms_domain_obj.fields}
+
                     # Generate list of observed vis/field/spw combinations
+                    spwids_int_set = set(map(int, spwids))
                     vislist_field_intent_spw_combinations = {}
                     for field_intent in field_intent_list:
                         vislist_for_field = []
                         spwids_for_field = set()
                         for vis in vislist:
-                            ms_domain_obj = inputs.context.observing_run.get_ms(vis)
-                            # Get the real spw IDs for this MS
-                            # TODO: This is missing spws that got removed in hif_uvcontsub.
-                            #       Need to involve the full spwlist from above.
-                            ms_science_spwids = [s.id for s in ms_domain_obj.get_spectral_windows()]
-                            if field_intent[0] in [f.name for f in ms_domain_obj.fields]:
+                            ms_science_spwids = ms_science_spwids_by_vis[vis]
+                            if field_intent[0] in field_names_by_vis[vis]:
                                 try:
                                     # Get a field domain object. Make sure that it has the necessary intent. Otherwise the list of spw IDs
                                     # will not match with the available science spw IDs.
                                     # Using all intents (inputs.intent) here. Further filtering is performed in the next block.
-                                    field_domain_objs = ms_domain_obj.get_fields(field_intent[0], intent=inputs.intent)
+                                    field_domain_objs = domain_lookup.get_fields(vis, field_intent[0], intent=inputs.intent)
                                     if field_domain_objs != []:
                                         field_domain_obj = field_domain_objs[0]
                                         # Get all science spw IDs for this field and record the ones that are present in this MS
                                         field_intent_science_spwids = [spw_domain_obj.id for spw_domain_obj in field_domain_obj.valid_spws if spw_domain_obj.id in ms_science_spwids and field_intent[1] in spw_domain_obj.intents]
                                         # Record the virtual spwids
-                                        spwids_per_vis_and_field = [
-                                            inputs.context.observing_run.real2virtual_spw_id(spwid, ms_domain_obj)
-                                            for spwid in field_intent_science_spwids
-                                            if inputs.context.observing_run.real2virtual_spw_id(spwid, ms_domain_obj) in list(map(int, spwids))]
+                                        virtual_spwids = (domain_lookup.real2virtual_spw_id(spwid, vis)
+                                                          for spwid in field_intent_science_spwids)
+                                        spwids_per_vis_and_field = [virtual_spwid for virtual_spwid in virtual_spwids
+                                                                    if virtual_spwid in spwids_int_set]
                                     else:
                                         spwids_per_vis_and_field = []
                                 except Exception as e:
@@ -775,8 +901,11 @@ class MakeImList(basetask.StandardTaskTemplate):
                     # Save original vislist_field_intent_spw_combinations dictionary to be able to generate
                     # proper messages if the vis list changes when falling back to a different data
                     # type for a given source/spw combination later on. The vislist_field_intent_spw_combinations
-                    # dictionary is possibly being modified on-the-fly below.
-                    original_vislist_field_intent_spw_combinations = copy.deepcopy(vislist_field_intent_spw_combinations)
+                    # dictionary is possibly being modified on-the-fly below. Its values are
+                    # only lists of vis names or spw IDs (or None), so copying the lists suffices.
+                    original_vislist_field_intent_spw_combinations = {
+                        field_intent: {key: list(value) if value is not None else None for key, value in combination.items()}
+                        for field_intent, combination in vislist_field_intent_spw_combinations.items()}
 
                     # Remove bad spws and record actual vis/field/spw combinations containing data.
                     # Record all spws with actual data in a global list.
@@ -786,38 +915,45 @@ class MakeImList(basetask.StandardTaskTemplate):
                     all_spw_keys = []
                     valid_data = {}
                     filtered_spwlist = []
-                    valid_data[str(vislist)] = {}
+                    # Aggregated values per vis list (any vis with data)
+                    vislist_valid_data = collections.defaultdict(lambda: collections.defaultdict(bool))
+                    vislist_key = tuple(vislist)
+                    valid_data[vislist_key] = vislist_valid_data
+                    # Observed field/spw selections per vis to be checked for unflagged data
+                    data_selections = collections.defaultdict(list)
                     for vis in vislist:
-                        ms_domain_obj = inputs.context.observing_run.get_ms(vis)
                         valid_data[vis] = {}
                         for field_intent in field_intent_list:
                             valid_data[vis][field_intent] = {}
-                            if field_intent not in valid_data[str(vislist)]:
-                                valid_data[str(vislist)][field_intent] = {}
                             # Check only possible field/spw combinations to speed up
-                            if vislist_field_intent_spw_combinations.get(field_intent, None) is not None:
+                            combination = vislist_field_intent_spw_combinations.get(field_intent)
+                            if combination is not None:
                                 # Check if this field is present in the current MS and has the necessary intent.
                                 # Using get_fields(name=...) since it does not throw an exception if the field is not found.
-                                if ms_domain_obj.get_fields(name=field_intent[0], intent=field_intent[1]) != []:
-                                    observed_vis_list = vislist_field_intent_spw_combinations.get(field_intent, None).get('vislist', None)
-                                    observed_spwids_list = vislist_field_intent_spw_combinations.get(field_intent, None).get('spwids', None)
-                                    if observed_vis_list is not None and observed_spwids_list is not None:
+                                if domain_lookup.get_fields(vis, name=field_intent[0], intent=field_intent[1]) != []:
+                                    observed_spwids_list = combination['spwids']
+                                    if combination['vislist'] is not None and observed_spwids_list is not None:
+                                        observed_spwids_str = [str(spwid) for spwid in observed_spwids_list]
                                         # Save spws in main list
-                                        all_spw_keys.extend(map(str, observed_spwids_list))
+                                        all_spw_keys.extend(observed_spwids_str)
                                         # Also save cont selection
-                                        all_spw_keys.append(','.join(map(str, observed_spwids_list)))
-                                        for observed_spwid in map(str, observed_spwids_list):
-                                            valid_data[vis][field_intent][str(observed_spwid)] = self.heuristics.has_data(field_intent_list=[field_intent], spwspec=observed_spwid, vislist=[vis])[field_intent]
-                                            if not valid_data[vis][field_intent][str(observed_spwid)] and vis in observed_vis_list:
-                                                LOG.warning('Data for EB {}, field {}, spw {} is completely flagged.'.format(
-                                                    os.path.basename(vis), field_intent[0], observed_spwid))
-                                            # Aggregated value per vislist (replace with lookup pattern later)
-                                            if str(observed_spwid) not in valid_data[str(vislist)][field_intent]:
-                                                valid_data[str(vislist)][field_intent][str(observed_spwid)] = valid_data[vis][field_intent][str(observed_spwid)]
-                                            else:
-                                                valid_data[str(vislist)][field_intent][str(observed_spwid)] = valid_data[str(vislist)][field_intent][str(observed_spwid)] or valid_data[vis][field_intent][str(observed_spwid)]
-                                            if valid_data[vis][field_intent][str(observed_spwid)]:
-                                                filtered_spwlist.append(observed_spwid)
+                                        all_spw_keys.append(','.join(observed_spwids_str))
+                                        data_selections[vis].extend((field_intent, observed_spwid) for observed_spwid in observed_spwids_str)
+
+                    # Check all selections in one go to share the per-MS selection work
+                    valid_selections = self.heuristics.has_data_batch(data_selections)
+                    for vis, field_intent_spwids in data_selections.items():
+                        vis_valid_data = valid_data[vis]
+                        for field_intent, observed_spwid in field_intent_spwids:
+                            has_data = valid_selections[(vis, field_intent, observed_spwid)]
+                            vis_valid_data[field_intent][observed_spwid] = has_data
+                            if has_data:
+                                filtered_spwlist.append(observed_spwid)
+                            elif vis in vislist_field_intent_spw_combinations[field_intent]['vislist']:
+                                LOG.warning('Data for EB {}, field {}, spw {} is completely flagged.'.format(
+                                    os.path.basename(vis), field_intent[0], observed_spwid))
+                            field_valid_data = vislist_valid_data[field_intent]
+                            field_valid_data[observed_spwid] = field_valid_data[observed_spwid] or has_data
                     filtered_spwlist = sorted(list(set(filtered_spwlist)), key=int)
 
                     # Collapse cont spws
@@ -851,26 +987,18 @@ class MakeImList(basetask.StandardTaskTemplate):
 
                     # Select only the lowest / highest frequency spw to get the smallest (for cell size)
                     # and largest beam (for imsize)
-                    min_freq = 1e15
-                    max_freq = 0.0
-                    min_freq_spwid = -1
-                    max_freq_spwid = -1
+                    spwid_centre_freqs = {}
                     for spwid in filtered_spwlist:
                         try:
                             ref_msname = self.heuristics.get_ref_msname(spwid)
-                            ref_ms = inputs.context.observing_run.get_ms(ref_msname)
-                            real_spwid = inputs.context.observing_run.virtual2real_spw_id(spwid, ref_ms)
-                            spwid_centre_freq = ref_ms.get_spectral_window(real_spwid).centre_frequency.to_units(measures.FrequencyUnits.HERTZ)
-                            if spwid_centre_freq < min_freq:
-                                min_freq = spwid_centre_freq
-                                min_freq_spwid = spwid
-                            if spwid_centre_freq > max_freq:
-                                max_freq = spwid_centre_freq
-                                max_freq_spwid = spwid
+                            spwid_centre_freqs[spwid] = domain_lookup.centre_frequency_hz(spwid, ref_msname)
                         except Exception as e:
                             LOG.warn(f'Could not determine min/max frequency for spw {spwid}. Exception: {str(e)}')
 
-                    if min_freq_spwid == -1 or max_freq_spwid == -1:
+                    if spwid_centre_freqs:
+                        min_freq_spwid = min(spwid_centre_freqs, key=spwid_centre_freqs.get)
+                        max_freq_spwid = max(spwid_centre_freqs, key=spwid_centre_freqs.get)
+                    else:
                         LOG.error('Could not determine min/max frequency spw IDs for %s.' % (str(filtered_spwlist_local)))
                         continue
 
@@ -1067,7 +1195,7 @@ class MakeImList(basetask.StandardTaskTemplate):
                     sorted_field_intent_list = sorted(field_intent_list, key=operator.itemgetter(1,0))
 
                     # In case of TARGET intent place representative source first in the list.
-                    if 'TARGET' in inputs.intent:
+                    if 'TARGET' in intents:
                         sorted_field_intent_list = utils.place_repr_source_first(sorted_field_intent_list, repr_source)
 
                     for field_intent in sorted_field_intent_list:
@@ -1082,8 +1210,8 @@ class MakeImList(basetask.StandardTaskTemplate):
                             actual_spwids = []
                             if vislist_field_intent_spw_combinations[field_intent].get('spwids', None) is not None:
                                 for spwid in spwspec.split(','):
-                                    if valid_data[str(vislist)].get(field_intent, None):
-                                        if valid_data[str(vislist)][field_intent].get(str(spwid), None):
+                                    if valid_data[vislist_key].get(field_intent, None):
+                                        if valid_data[vislist_key][field_intent].get(str(spwid), None):
                                             if int(spwid) in vislist_field_intent_spw_combinations[field_intent]['spwids']:
                                                 valid_field_spwspec_combination = True
                                                 actual_spwids.append(spwid)
@@ -1113,7 +1241,7 @@ class MakeImList(basetask.StandardTaskTemplate):
                                     (local_ms_objects_and_columns, local_selected_datatype) = inputs.context.observing_run.get_measurement_sets_of_type(dtypes=specmode_datatypes, msonly=False, source=field_intent[0], spw=adjusted_spwspec, vis=vislist)
                                 else:
                                     # In manual mode check determine the data column for the current data type.
-                                    (local_ms_objects_and_columns, local_selected_datatype) = inputs.context.observing_run.get_measurement_sets_of_type(dtypes=[DataType[selected_datatype_str]], msonly=False, source=field_intent[0], spw=adjusted_spwspec, vis=vislist)
+                                    (local_ms_objects_and_columns, local_selected_datatype) = inputs.context.observing_run.get_measurement_sets_of_type(dtypes=[_DATATYPE_BY_NAME[selected_datatype_str]], msonly=False, source=field_intent[0], spw=adjusted_spwspec, vis=vislist)
 
                                 if local_selected_datatype is None:
                                     expected_num_targets -= 1
@@ -1244,11 +1372,6 @@ class MakeImList(basetask.StandardTaskTemplate):
                                 imagename = inputs.imagename
 
                             if inputs.nbins != '' and inputs.specmode != 'cont':
-                                nbin_items = inputs.nbins.split(',')
-                                nbins_dict = {}
-                                for nbin_item in nbin_items:
-                                    key, value = nbin_item.split(':')
-                                    nbins_dict[key] = int(value)
                                 try:
                                     if '*' in nbins_dict:
                                         nbin = nbins_dict['*']
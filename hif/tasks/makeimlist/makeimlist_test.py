@@ -0,0 +1,54 @@
+import pytest
+
+from .makeimlist import _user_datatypes_error
+
+params_valid_datatypes = [
+    ['REGCAL'],
+    ['SELFCAL'],
+    ['SELFCAL', 'REGCAL'],
+    ['REGCAL_CONTLINE_ALL'],
+    ['SELFCAL_CONTLINE_SCIENCE', 'REGCAL_CONTLINE_SCIENCE'],
+]
+
+
+@pytest.mark.parametrize("user_datatypes_str", params_valid_datatypes)
+def test_user_datatypes_valid(user_datatypes_str):
+    """Test _user_datatypes_error() for valid data type selections
+
+    REGCAL/SELFCAL on their own and lists of known data type names
+    are accepted.
+    """
+    assert _user_datatypes_error(user_datatypes_str) is None
+
+
+params_mixed_datatypes = [
+    ['REGCAL', 'REGCAL_CONTLINE_ALL'],
+    ['SELFCAL', 'SELFCAL_CONTLINE_SCIENCE'],
+    ['REGCAL', 'SELFCAL', 'RAW'],
+]
+
+
+@pytest.mark.parametrize("user_datatypes_str", params_mixed_datatypes)
+def test_user_datatypes_regcal_selfcal_exclusive(user_datatypes_str):
+    """Test _user_datatypes_error() for REGCAL/SELFCAL mixed with explicit data types
+
+    REGCAL/SELFCAL are expanded to explicit data types, so combining
+    them with explicit data types is an error.
+    """
+    assert _user_datatypes_error(user_datatypes_str) == \
+        '"REGCAL"/"SELFCAL" and explicit data types are mutually exclusive'
+
+
+params_undefined_datatypes = [
+    (['FOO'], 'Undefined data type(s): FOO'),
+    (['REGCAL_CONTLINE_ALL', 'FOO', 'BAR'], 'Undefined data type(s): FOO,BAR'),
+]
+
+
+@pytest.mark.parametrize("user_datatypes_str, expected", params_undefined_datatypes)
+def test_user_datatypes_undefined(user_datatypes_str, expected):
+    """Test _user_datatypes_error() for unknown data type names
+
+    Unknown names are reported as undefined data types.
+    """
+    assert _user_datatypes_error(user_datatypes_str) == expected